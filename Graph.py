@@ -1,20 +1,48 @@
 from math import inf as infinity
+import collections
+import sys
+import heapq
 
 
 
+class Cluster:
+    '''group of linked nodes'''
+    __slots__ = ('members', 'edges_amount', 'transactions_amount', 'density', 'volume')
+
+    def __init__(self, members:list):
+        self.members = members # node names
+        self.edges_amount = 0 # connections sender -> recipient inside cluster
+        self.transactions_amount = 0 # transactions inside cluster
+        self.density = 0.0 # edges_amount / possible connections
+        self.volume = None # amount sent inside cluster, set by TrasnsactionsChain
+
+    def __len__(self):
+        return len(self.members)
+
+    def __repr__(self):
+        return f"<Cluster {len(self.members)} members | {self.transactions_amount} transactions | {self.density:.3f} density>"
+
 class Graph:
-    def __init__(self, connections_matrix:list, nodes:list, weights:list):
-        self.connections_matrix = connections_matrix
+    def __init__(self, nodes:list, outgoing:list=None, incoming:list=None):
+        '''
+        outgoing[i] - {j:transactions_amount} for transactions i -> j
+        incoming[i] - {j:transactions_amount} for transactions j -> i
+        '''
         self.nodes = nodes
-        self.weights = weights
+        self.nodes_lookup_table = {} # node_name:index
+        for index in range(len(nodes)):
+            self.nodes_lookup_table[nodes[index]] = index
+        if outgoing == None:
+            outgoing = [{} for _ in range(len(nodes))]
+        if incoming == None:
+            incoming = [{} for _ in range(len(nodes))]
+        self.outgoing = outgoing
+        self.incoming = incoming
 
     def _get_index(self, node) -> int:
         '''returns -1 if not found'''
         if isinstance(node,str):
-            try:
-                return self.nodes.index(node)
-            except:
-                return -1
+            return self.nodes_lookup_table.get(node,-1)
         elif isinstance(node,int):
             return node
         else:
@@ -23,44 +51,84 @@ class Graph:
     def _get_node_name(self, index:int) -> str:
         return self.nodes[index]
 
+    def add_node(self, name:str) -> int:
+        '''returns index of the node, adds it if it is new'''
+        index = self.nodes_lookup_table.get(name)
+        if index == None:
+            index = len(self.nodes)
+            name = sys.intern(name)
+            self.nodes.append(name)
+            self.nodes_lookup_table[name] = index
+            self.outgoing.append({})
+            self.incoming.append({})
+        return index
+
+    def add_edge(self, sender:int, recipient:int, amount:int = 1):
+        '''registers amount of transactions sender -> recipient'''
+        self.outgoing[sender][recipient] = self.outgoing[sender].get(recipient,0) + amount
+        self.incoming[recipient][sender] = self.incoming[recipient].get(sender,0) + amount
+
+    def get_connection(self, first, second) -> int:
+        '''
+        0 - no connection
+        1 - sender
+        2 - reciever
+        3 - all connections
+        '''
+        first = self._get_index(first)
+        second = self._get_index(second)
+        if first == -1 or second == -1:
+            return 0
+        connection = 0
+        if second in self.outgoing[first]:
+            connection |= 1
+        if second in self.incoming[first]:
+            connection |= 2
+        return connection
+
+    def get_weight(self, first, second) -> int:
+        '''returns amount of transactions between nodes in both directions'''
+        first = self._get_index(first)
+        second = self._get_index(second)
+        if first == -1 or second == -1:
+            return 0
+        return self.outgoing[first].get(second,0) + self.incoming[first].get(second,0)
+
     def get_neighbours(self, node) -> list:
         '''returns all neighbours'''
-        to_return = []
         index = self._get_index(node)
         if index == -1:
-            return to_return
+            return []
 
-        for neighbour_index in range(len(self.connections_matrix[index])):
-            neighbour = self.connections_matrix[index][neighbour_index]
-            if neighbour != 0:
+        outgoing = self.outgoing[index]
+        to_return = list(outgoing)
+        for neighbour_index in self.incoming[index]:
+            if neighbour_index not in outgoing:
                 to_return.append(neighbour_index)
         return to_return
 
     def get_reachable_neighbours(self, node) -> list:
-        to_return = []
         index = self._get_index(node)
         if index == -1:
-            return to_return
-
-        for neighbour_index in range(len(self.connections_matrix[index])):
-            neighbour = self.connections_matrix[index][neighbour_index]
-            if neighbour == 1 or neighbour == 3:
-                to_return.append(neighbour_index)
-        return to_return
+            return []
+        return list(self.outgoing[index])
 
     def get_reached_by_neighbours(self, node) -> list:
-        to_return = []
         index = self._get_index(node)
         if index == -1:
-            return to_return
-
-        for neighbour_index in range(len(self.connections_matrix[index])):
-            neighbour = self.connections_matrix[index][neighbour_index]
-            if neighbour == 2 or neighbour == 3:
-                to_return.append(neighbour_index)
-        return to_return
+            return []
+        return list(self.incoming[index])
     
-    def find_shortest_sending_rout(self, start, end) -> list:
+    def _build_rout(self, parents:dict, node:int) -> list:
+        '''parents - {node:previous_node}, first node has parent None'''
+        rout = []
+        while node != None:
+            rout.append(node)
+            node = parents[node]
+        rout.reverse()
+        return rout
+
+    def find_shortest_sending_rout(self, start, end, bidirectional = True) -> list:
         '''
         find rout between start and end, 
             but start is sender and end is receiver
@@ -69,158 +137,339 @@ class Graph:
             where node1 -> node2 -> node3
 
         returns empty list if no correlation
-        '''
-        to_return = []
 
-        if isinstance(start,str) and isinstance(end,str):
-            try:
-                start_index = self.nodes.index(start)
-                end_index = self.nodes.index(end)
-            except:
-                return to_return
-        else:
-            start_index = start
-            end_index = end
-        
-        if len(self.get_reachable_neighbours(start_index)) == 0\
-            or len(self.get_reached_by_neighbours(end_index)) == 0:
-            return to_return
+        bidirectional - search forward from start and backward from end
+            at the same time, otherwise plain BFS from start
+        '''
+        start_index = self._get_index(start)
+        end_index = self._get_index(end)
+        if start_index == -1 or end_index == -1:
+            return []
+        if start_index == end_index:
+            return [self._get_node_name(start_index)]
+
+        if not bidirectional:
+            return self.find_shortest_sending_routs(start_index, [end_index]).get(
+                self._get_node_name(end_index), [])
+
+        forward_parents = {start_index:None}
+        backward_parents = {end_index:None}
+        forward_frontier = [start_index]
+        backward_frontier = [end_index]
+
+        while len(forward_frontier) > 0 and len(backward_frontier) > 0:
+            # expand whole level of the smaller side
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, parents, other_parents, edges = \
+                    forward_frontier, forward_parents, backward_parents, self.outgoing
+            else:
+                frontier, parents, other_parents, edges = \
+                    backward_frontier, backward_parents, forward_parents, self.incoming
+
+            next_frontier = []
+            meeting_node = -1
+            for node in frontier:
+                for neighbour in edges[node]:
+                    if neighbour in parents:
+                        continue
+                    parents[neighbour] = node
+                    next_frontier.append(neighbour)
+                    if meeting_node == -1 and neighbour in other_parents:
+                        meeting_node = neighbour
+
+            if meeting_node != -1:
+                rout = self._build_rout(forward_parents, meeting_node)
+                rout.extend(self._build_rout(backward_parents, meeting_node)[::-1][1:])
+                return [self._get_node_name(node) for node in rout]
+
+            if frontier is forward_frontier:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
 
+        return []
 
-        processed_nodes = {}
+    def find_shortest_sending_routs(self, start, ends = None) -> dict:
+        '''
+        finds shortest sending routs from start to many nodes with one BFS
 
-        distances = {}
-        for node in range(len(self.nodes)):
-            distances[node] = infinity
-        distances[start_index] = 0
+        ends - nodes to find routs to, None for all reachable nodes
 
-        cannot_be_reached = False
+        returns {node_name:rout}, unreachable nodes are omitted
+        '''
+        start_index = self._get_index(start)
+        if start_index == -1:
+            return {}
+        targets = None
+        if ends != None:
+            targets = set(self._get_index(end) for end in ends)
+            targets.discard(-1)
+
+        parents = {start_index:None}
+        queue = collections.deque([start_index])
+        found = []
+        if targets == None or start_index in targets:
+            found.append(start_index)
+        while len(queue) > 0:
+            if targets != None and len(found) == len(targets):
+                break
+            node = queue.popleft()
+            for neighbour in self.outgoing[node]:
+                if neighbour in parents:
+                    continue
+                parents[neighbour] = node
+                queue.append(neighbour)
+                if targets == None or neighbour in targets:
+                    found.append(neighbour)
+
+        to_return = {}
+        for node in found:
+            to_return[self._get_node_name(node)] = [self._get_node_name(rout_node)
+                                                    for rout_node in self._build_rout(parents, node)]
+        return to_return
 
-        copy_start = start_index
-        while copy_start != end_index:
+    def _get_weighted_neighbours(self, index:int):
+        '''yields (neighbour, weight) for all neighbours'''
+        outgoing = self.outgoing[index]
+        incoming = self.incoming[index]
+        for neighbour, amount in outgoing.items():
+            yield neighbour, amount + incoming.get(neighbour,0)
+        for neighbour, amount in incoming.items():
+            if neighbour not in outgoing:
+                yield neighbour, amount
+
+    def _strongest_correlations(self, start_index:int, targets = None, max_hops = None) -> tuple:
+        '''
+        widest path search, strength of rout is weight of its weakest connection
 
-            processed_nodes[copy_start] = True
+        stops when all targets are settled,
+            with max_hops every (node, hops) state is searched separately
 
-            cannot_be_reached = True
-            neighbours = self.get_reachable_neighbours(copy_start)
-            for neighbour in neighbours:
-                if neighbour in processed_nodes:
-                    continue
-                cannot_be_reached = False
-                if distances[neighbour] > distances[copy_start] + 1:
-                    distances[neighbour] = distances[copy_start] + 1
-            
-            if cannot_be_reached:               
-                neighbours = self.get_reached_by_neighbours(copy_start)
-                for neighbour in neighbours:
-                    if distances[copy_start]-1 == distances[neighbour]:
-                        copy_start = neighbour
+        returns (settled, parents, strengths) where
+            settled - {node:(node,hops)} state of the strongest rout to node
+            parents - {(node,hops):previous_state}
+            strengths - {(node,hops):strength}
+        '''
+        strengths = {(start_index,0):infinity} # state:strength
+        parents = {(start_index,0):None}
+        heap = [(-infinity, 0, start_index)]
+        settled = {}
+        least_hops = {} # node:least hops of expanded state
+        remaining = None
+        if targets != None:
+            remaining = len(targets)
+
+        while len(heap) > 0:
+            strength, hops, node = heapq.heappop(heap)
+            strength = -strength
+            state = (node, hops)
+            if strength < strengths[state]:
+                continue
+            # stronger rout with less hops was already expanded
+            if node in least_hops and hops >= least_hops[node]:
+                continue
+            least_hops[node] = hops
+            if node not in settled:
+                settled[node] = state
+                if remaining != None and node in targets:
+                    remaining -= 1
+                    if remaining == 0:
                         break
 
+            if max_hops != None:
+                if hops >= max_hops:
+                    continue
+                next_hops = hops + 1
             else:
-                for neighbour in neighbours:
-                    if neighbour not in processed_nodes:
-                        copy_start = neighbour
-                        break
-
-        processed_nodes = {}
-
-        rout = []
-        
-        copy_end = end_index
-        while True:
-            processed_nodes[copy_end] = True
-            neighbours = self.get_reached_by_neighbours(copy_end)
-            
-            cannot_be_reached = True
-            for neighbour in neighbours:
-                if neighbour in processed_nodes:
+                next_hops = 0
+            for neighbour, weight in self._get_weighted_neighbours(node):
+                if max_hops == None and neighbour in settled:
                     continue
+                neighbour_state = (neighbour, next_hops)
+                neighbour_strength = min(strength, weight)
+                if neighbour_strength > strengths.get(neighbour_state, 0):
+                    strengths[neighbour_state] = neighbour_strength
+                    parents[neighbour_state] = state
+                    heapq.heappush(heap, (-neighbour_strength, next_hops, neighbour))
 
-                if distances[copy_end]-1 == distances[neighbour]:
-                    rout.insert(0,copy_end)
-                    cannot_be_reached = False
-                    copy_end = neighbour
-                    break
-            
-            if cannot_be_reached:
-                neighbours = self.get_reachable_neighbours(copy_end)
-                for neighbour in neighbours:
-                    if distances[copy_end] + 1 == distances[neighbour]:
-                        copy_end = neighbour
-                        break
-            if copy_end == start_index:
-                rout.insert(0,start_index)
-                break
-        
-        to_return = []
-        for node in rout:
-            to_return.append(self._get_node_name(node))
-        
-        return to_return
+        return settled, parents, strengths
 
-    def find_strongest_correlations(self, start, end):
-        if isinstance(start,str) and isinstance(end,str):
-            try:
-                start_index = self.nodes.index(start)
-                end_index = self.nodes.index(end)
-            except:
-                return to_return
-        else:
-            start_index = start
-            end_index = end
-
-        processed_nodes = {}
-
-        distances = {}
-        for node in range(len(self.nodes)):
-            distances[node] = 0
-        distances[start_index] = 1
-
-        for node_index in range(len(self.nodes)):
-            max_weight = 0
-            index_max = -1
-
-            for i in range(len(self.nodes)):
-                if i not in processed_nodes\
-                   and distances[i] > max_weight:
-
-                    max_weight = distances[i]
-                    index_max = i
-            processed_nodes[node_index] = True
-            for i in range(len(self.nodes)):
-                if i in processed_nodes:
-                    continue
-                if distances[index_max] + self.weights[index_max][i] > distances[i]:
-                    distances[i] = distances[index_max] + self.weights[index_max][i]
-            
-
-        processed_nodes = {}
+    def _build_state_rout(self, parents:dict, state:tuple) -> list:
         rout = []
-        
-        copy_end = end_index
-        while True:
-            processed_nodes[copy_end] = True
-            neighbours = self.get_neighbours(copy_end)
-            
-            for neighbour in neighbours:
-                if neighbour in processed_nodes:
-                    continue
+        while state != None:
+            rout.append(self._get_node_name(state[0]))
+            state = parents[state]
+        rout.reverse()
+        return rout
 
-                if distances[copy_end] - self.weights[copy_end][neighbour] == distances[neighbour]:
-                    rout.insert(0,copy_end)
-                    copy_end = neighbour
-                    break
-            
-            if copy_end == start_index:
-                rout.insert(0,start_index)
-                break
-        
+    def find_strongest_correlations(self, start, end, max_hops = None) -> list:
+        '''
+        finds rout between start and end with the strongest weakest connection,
+            connection weight is amount of transactions in both directions
+
+        max_hops - maximum length of rout
 
-        
+        returns rout in format [node1, node2, node3], empty list if no correlation
+        '''
+        start_index = self._get_index(start)
+        end_index = self._get_index(end)
+        if start_index == -1 or end_index == -1:
+            return []
+        settled, parents, _ = self._strongest_correlations(start_index, {end_index}, max_hops)
+        if end_index not in settled:
+            return []
+        return self._build_state_rout(parents, settled[end_index])
+
+    def find_strongest_correlations_routs(self, start, ends = None, max_hops = None) -> dict:
+        '''
+        finds strongest routs from start to many nodes with one search
 
-        
+        ends - nodes to find routs to, None for all reachable nodes
 
+        returns {node_name:rout}, unreachable nodes are omitted
+        '''
+        start_index = self._get_index(start)
+        if start_index == -1:
+            return {}
+        targets = None
+        if ends != None:
+            targets = set(self._get_index(end) for end in ends)
+            targets.discard(-1)
+        settled, parents, _ = self._strongest_correlations(start_index, targets, max_hops)
+        to_return = {}
+        for node, state in settled.items():
+            if targets == None or node in targets:
+                to_return[self._get_node_name(node)] = self._build_state_rout(parents, state)
+        return to_return
 
+    def rank_correlations(self, start, top = None, max_hops = None) -> list:
+        '''returns list[node_name, strength] sorted by strength of correlation with start'''
+        start_index = self._get_index(start)
+        if start_index == -1:
+            return []
+        settled, _, strengths = self._strongest_correlations(start_index, None, max_hops)
+        ranking = [[self._get_node_name(node), strengths[state]]
+                   for node, state in settled.items() if node != start_index]
+        def sorting_criteria(element):
+            return element[-1]
+        ranking.sort(reverse=True, key=sorting_criteria)
+        if top != None:
+            return ranking[:top]
+        return ranking
+
+    def _get_connected_components(self) -> list:
+        '''union-find over connections in both directions'''
+        parents = list(range(len(self.nodes)))
+        sizes = [1]*len(self.nodes)
+
+        def find(node):
+            while parents[node] != node:
+                parents[node] = parents[parents[node]]
+                node = parents[node]
+            return node
 
+        for node in range(len(self.nodes)):
+            for neighbour in self.outgoing[node]:
+                first = find(node)
+                second = find(neighbour)
+                if first == second:
+                    continue
+                if sizes[first] < sizes[second]:
+                    first, second = second, first
+                parents[second] = first
+                sizes[first] += sizes[second]
 
+        components = {} # root:[node]
+        for node in range(len(self.nodes)):
+            components.setdefault(find(node), []).append(node)
+        return list(components.values())
+
+    def _get_strongly_connected_components(self) -> list:
+        '''iterative Tarjan over sender -> recipient connections'''
+        indexes = [-1]*len(self.nodes)
+        lowlinks = [0]*len(self.nodes)
+        on_stack = [False]*len(self.nodes)
+        stack = []
+        components = []
+        counter = 0
+
+        for root in range(len(self.nodes)):
+            if indexes[root] != -1:
+                continue
+            indexes[root] = lowlinks[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(self.outgoing[root]))]
+            while len(work) > 0:
+                node, neighbours = work[-1]
+                for neighbour in neighbours:
+                    if indexes[neighbour] == -1:
+                        indexes[neighbour] = lowlinks[neighbour] = counter
+                        counter += 1
+                        stack.append(neighbour)
+                        on_stack[neighbour] = True
+                        work.append((neighbour, iter(self.outgoing[neighbour])))
+                        break
+                    elif on_stack[neighbour] and indexes[neighbour] < lowlinks[node]:
+                        lowlinks[node] = indexes[neighbour]
+                else:
+                    work.pop()
+                    if len(work) > 0 and lowlinks[node] < lowlinks[work[-1][0]]:
+                        lowlinks[work[-1][0]] = lowlinks[node]
+                    if lowlinks[node] == indexes[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        return components
+
+    def get_connected_components(self) -> list:
+        '''returns list[list[node_name]] of nodes linked in any direction'''
+        return [[self._get_node_name(node) for node in component]
+                for component in self._get_connected_components()]
+
+    def get_strongly_connected_components(self) -> list:
+        '''returns list[list[node_name]] of nodes that can send to each other'''
+        return [[self._get_node_name(node) for node in component]
+                for component in self._get_strongly_connected_components()]
+
+    def get_clusters(self, strongly_connected = False, min_size = 2) -> list:
+        '''
+        returns list[Cluster] sorted by size,
+            clusters are connected or strongly connected components
+        '''
+        if strongly_connected:
+            components = self._get_strongly_connected_components()
+        else:
+            components = self._get_connected_components()
+        components = [component for component in components if len(component) >= min_size]
+
+        component_ids = {} # node:component_id
+        for component_id in range(len(components)):
+            for node in components[component_id]:
+                component_ids[node] = component_id
+        clusters = [Cluster([self._get_node_name(node) for node in component])
+                    for component in components]
+
+        for node, component_id in component_ids.items():
+            cluster = clusters[component_id]
+            for neighbour, amount in self.outgoing[node].items():
+                if component_ids.get(neighbour) != component_id:
+                    continue
+                cluster.transactions_amount += amount
+                if neighbour != node:
+                    cluster.edges_amount += 1
+
+        for cluster in clusters:
+            if len(cluster) > 1:
+                cluster.density = cluster.edges_amount / (len(cluster)*(len(cluster)-1))
+
+        def sorting_criteria(element):
+            return len(element)
+        clusters.sort(reverse=True, key=sorting_criteria)
+        return clusters
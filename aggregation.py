@@ -0,0 +1,124 @@
+import numpy as np
+import transactions_chain
+
+
+class ChainAggregates:
+    '''Per-account totals for all accounts of TrasnsactionsChain computed in one pass'''
+    def __init__(self, chain:transactions_chain.TrasnsactionsChain):
+        transactions = chain.transactions
+        if isinstance(transactions, transactions_chain.TransactionsColumns):
+            self.accounts = list(transactions.accounts)
+            self.accounts_lookup_table = dict(transactions.accounts_lookup_table)
+            # copies, so the arrays of the chain are not pinned by exported buffers
+            senders = np.frombuffer(transactions.senders, dtype=np.intc).astype(np.int64)
+            recipients = np.frombuffer(transactions.recipients, dtype=np.intc).astype(np.int64)
+            amounts = np.frombuffer(transactions.amounts, dtype=np.float64).copy()
+        else:
+            self.accounts = [] # account_id:username
+            self.accounts_lookup_table = {} # username:account_id
+            senders = np.fromiter((self._get_account_id(transaction.sender)
+                                   for transaction in transactions),
+                                  dtype=np.int64, count=len(transactions))
+            recipients = np.fromiter((self._get_account_id(transaction.recipient)
+                                      for transaction in transactions),
+                                     dtype=np.int64, count=len(transactions))
+            amounts = np.fromiter((transaction.amount for transaction in transactions),
+                                  dtype=np.float64, count=len(transactions))
+
+        accounts_amount = len(self.accounts)
+        self.recieved = np.bincount(recipients, weights=amounts, minlength=accounts_amount)
+        self.sent = np.bincount(senders, weights=amounts, minlength=accounts_amount)
+        self.recieved_count = np.bincount(recipients, minlength=accounts_amount)
+        self.sent_count = np.bincount(senders, minlength=accounts_amount)
+
+        # counterparty totals, one entry per unique sender -> recipient pair
+        pairs, inverse = np.unique(senders*accounts_amount + recipients, return_inverse=True)
+        self.pair_senders = pairs // max(accounts_amount, 1)
+        self.pair_recipients = pairs % max(accounts_amount, 1)
+        self.pair_amounts = np.bincount(inverse, weights=amounts, minlength=len(pairs))
+
+        self._by_recipient = np.lexsort((-self.pair_amounts, self.pair_recipients))
+        self._by_recipient_keys = self.pair_recipients[self._by_recipient]
+        self._by_sender = np.lexsort((-self.pair_amounts, self.pair_senders))
+        self._by_sender_keys = self.pair_senders[self._by_sender]
+
+    def _get_account_id(self, username:str) -> int:
+        account_id = self.accounts_lookup_table.get(username)
+        if account_id == None:
+            account_id = len(self.accounts)
+            self.accounts.append(username)
+            self.accounts_lookup_table[username] = account_id
+        return account_id
+
+    def total_recieved(self, username:str) -> float:
+        account_id = self.accounts_lookup_table.get(username)
+        if account_id == None:
+            return 0.0
+        return float(self.recieved[account_id])
+
+    def total_sent(self, username:str) -> float:
+        account_id = self.accounts_lookup_table.get(username)
+        if account_id == None:
+            return 0.0
+        return float(self.sent[account_id])
+
+    def totals(self) -> dict:
+        '''returns {username:(total_recieved, total_sent)}'''
+        return dict(zip(self.accounts, zip(self.recieved.tolist(), self.sent.tolist())))
+
+    def _group(self, order, sorted_keys, account_id:int):
+        start = np.searchsorted(sorted_keys, account_id, side='left')
+        end = np.searchsorted(sorted_keys, account_id, side='right')
+        return order[start:end]
+
+    def _top_all(self, order, sorted_keys, keys, counterparties, top:int) -> dict:
+        ranks = np.arange(len(order)) - np.searchsorted(sorted_keys, sorted_keys, side='left')
+        selected = order[ranks < top]
+        to_return = {}
+        for key, counterparty, amount in zip(keys[selected].tolist(),
+                                             counterparties[selected].tolist(),
+                                             self.pair_amounts[selected].tolist()):
+            to_return.setdefault(self.accounts[key], []).append([self.accounts[counterparty], amount])
+        return to_return
+
+    def get_top_senders(self, recipient_username:str, top = 10) -> list:
+        '''returns list[sender_username, amount_sent]'''
+        account_id = self.accounts_lookup_table.get(recipient_username)
+        if account_id == None:
+            return []
+        group = self._group(self._by_recipient, self._by_recipient_keys, account_id)[:top]
+        return [[self.accounts[sender], amount]
+                for sender, amount in zip(self.pair_senders[group].tolist(),
+                                          self.pair_amounts[group].tolist())]
+
+    def get_top_recipients(self, sender_username:str, top = 10) -> list:
+        '''returns list[recipient_username, amount_recieved_from_sender]'''
+        account_id = self.accounts_lookup_table.get(sender_username)
+        if account_id == None:
+            return []
+        group = self._group(self._by_sender, self._by_sender_keys, account_id)[:top]
+        return [[self.accounts[recipient], amount]
+                for recipient, amount in zip(self.pair_recipients[group].tolist(),
+                                             self.pair_amounts[group].tolist())]
+
+    def top_senders(self, top = 10) -> dict:
+        '''returns {recipient_username:list[sender_username, amount_sent]} for all accounts'''
+        return self._top_all(self._by_recipient, self._by_recipient_keys,
+                             self.pair_recipients, self.pair_senders, top)
+
+    def top_recipients(self, top = 10) -> dict:
+        '''returns {sender_username:list[recipient_username, amount_recieved]} for all accounts'''
+        return self._top_all(self._by_sender, self._by_sender_keys,
+                             self.pair_senders, self.pair_recipients, top)
+
+    def is_suspicious(self) -> np.ndarray:
+        '''batch TrasnsactionsChain.is_suspicious, indexed by account_id'''
+        return self.recieved > self.sent
+
+    def get_suspicious_accounts(self) -> list:
+        return [self.accounts[account_id]
+                for account_id in np.flatnonzero(self.is_suspicious()).tolist()]
+
+
+def aggregate(chain:transactions_chain.TrasnsactionsChain) -> ChainAggregates:
+    return ChainAggregates(chain)
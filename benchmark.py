@@ -0,0 +1,229 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import cycles
+import fetch_policy
+import flow
+import synthetic
+import transactions_chain
+
+
+SIZES = (10**3, 10**4, 10**5, 10**6)
+
+# benchmarks above their size are skipped by default,
+# crawling goes through HTTP, appends are O(n) list inserts
+# and amount of cycles grows faster than amount of transactions
+MAX_SIZES = {'trace_transactions':10**5,
+             'append_transaction':10**5,
+             'find_cycles':10**5}
+
+
+def _best_time(function, repeat:int) -> float:
+    '''returns the smallest time of repeat calls'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best == None or elapsed < best:
+            best = elapsed
+    return best
+
+def _get_routs_pairs(dataset:synthetic.SyntheticDataset, amount:int = 10) -> list:
+    '''
+    pairs (account, farm master), money reaches masters
+        only through hubs paying their miners
+    '''
+    usernames = dataset.usernames()
+    pairs = []
+    for index in range(amount):
+        master = dataset.masters[index % len(dataset.masters)]
+        pairs.append((usernames[(index*7919) % len(usernames)], master))
+    return pairs
+
+def bench_trace_transactions(dataset, chain, repeat) -> float:
+    seed = dataset.masters[0]
+    with synthetic.FakeServer(dataset) as server:
+        return _best_time(lambda: transactions_chain.trace_transactions(seed,
+                                                                       use_asyncio=True,
+                                                                       api_url=server.api_url),
+                          repeat)
+
+def bench_append_transaction(dataset, chain, repeat) -> float:
+    transactions = dataset.to_transactions()
+    def append_all():
+        new_chain = transactions_chain.TrasnsactionsChain(dataset.masters[0])
+        for transaction in transactions:
+            new_chain.append_transaction(transaction)
+    return _best_time(append_all, repeat)
+
+def bench_extend_transactions(dataset, chain, repeat) -> float:
+    transactions = dataset.to_transactions()
+    def extend_all():
+        new_chain = transactions_chain.TrasnsactionsChain(dataset.masters[0])
+        new_chain.extend_transactions(transactions)
+    return _best_time(extend_all, repeat)
+
+def bench_create_graph(dataset, chain, repeat) -> float:
+    return _best_time(chain.create_graph, repeat)
+
+def bench_find_shortest_sending_rout(dataset, chain, repeat) -> float:
+    graph = chain.create_graph()
+    pairs = _get_routs_pairs(dataset)
+    def find_all():
+        for start, end in pairs:
+            graph.find_shortest_sending_rout(start, end)
+    return _best_time(find_all, repeat)
+
+def bench_find_strongest_correlations(dataset, chain, repeat) -> float:
+    graph = chain.create_graph()
+    pairs = _get_routs_pairs(dataset)
+    def find_all():
+        for start, end in pairs:
+            graph.find_strongest_correlations(start, end)
+    return _best_time(find_all, repeat)
+
+def bench_detect_suspicious_accounts(dataset, chain, repeat) -> float:
+    return _best_time(lambda: transactions_chain.detect_suspicious_accounts(dataset.masters[0],
+                                                                            transactions=chain),
+                      repeat)
+
+def bench_trace_flow(dataset, chain, repeat) -> float:
+    return _best_time(lambda: flow.trace_flow(chain, dataset.hubs[0]), repeat)
+
+def bench_find_cycles(dataset, chain, repeat) -> float:
+    def find_all():
+        for _ in cycles.find_cycles(chain):
+            pass
+    return _best_time(find_all, repeat)
+
+BENCHMARKS = {'trace_transactions':bench_trace_transactions,
+              'append_transaction':bench_append_transaction,
+              'extend_transactions':bench_extend_transactions,
+              'create_graph':bench_create_graph,
+              'find_shortest_sending_rout':bench_find_shortest_sending_rout,
+              'find_strongest_correlations':bench_find_strongest_correlations,
+              'detect_suspicious_accounts':bench_detect_suspicious_accounts,
+              'trace_flow':bench_trace_flow,
+              'find_cycles':bench_find_cycles}
+
+
+def _get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes = SIZES, benchmarks = None, repeat:int = 3, seed:int = 0,
+        max_sizes = MAX_SIZES, log = None) -> dict:
+    '''
+    returns {'commit', 'python', 'platform', 'seed', 'repeat',
+             'results':{benchmark:{size:seconds or None if skipped}}}
+
+    log - callable getting progress lines
+    '''
+    if benchmarks == None:
+        benchmarks = list(BENCHMARKS)
+    # crawls must not be slowed down by live API limits
+    rate_limiter = transactions_chain.RATE_LIMITER
+    transactions_chain.RATE_LIMITER = fetch_policy.RateLimiter(rate=10**9)
+    results = {name:{} for name in benchmarks}
+    try:
+        for size in sizes:
+            dataset = synthetic.generate(size, seed)
+            chain = dataset.to_chain()
+            for name in benchmarks:
+                max_size = max_sizes.get(name)
+                if max_size != None and size > max_size:
+                    results[name][str(size)] = None
+                    continue
+                seconds = BENCHMARKS[name](dataset, chain, repeat)
+                results[name][str(size)] = seconds
+                if log != None:
+                    log(f"{name} {size}: {seconds:.4f}s")
+    finally:
+        transactions_chain.RATE_LIMITER = rate_limiter
+    return {'commit':_get_commit(),
+            'python':platform.python_version(),
+            'platform':platform.platform(),
+            'seed':seed,
+            'repeat':repeat,
+            'results':results}
+
+def compare(old:dict, new:dict, threshold:float = 1.2) -> list:
+    '''
+    returns list[benchmark, size, old_seconds, new_seconds, ratio, is_regression]
+        for measurements present in both results
+    '''
+    to_return = []
+    for name, sizes in new['results'].items():
+        for size, seconds in sizes.items():
+            old_seconds = old['results'].get(name, {}).get(size)
+            if seconds == None or old_seconds == None:
+                continue
+            ratio = seconds/old_seconds if old_seconds > 0 else 1.0
+            to_return.append([name, int(size), old_seconds, seconds, ratio, ratio > threshold])
+    return to_return
+
+def format_results(results:dict) -> str:
+    sizes = sorted({int(size) for sizes in results['results'].values() for size in sizes})
+    lines = ['benchmark'.ljust(30) + ''.join(f"{size:>12}" for size in sizes)]
+    for name, measurements in results['results'].items():
+        line = name.ljust(30)
+        for size in sizes:
+            seconds = measurements.get(str(size))
+            line += f"{'-':>12}" if seconds == None else f"{seconds:>12.4f}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def format_comparison(comparison:list) -> str:
+    lines = []
+    for name, size, old_seconds, seconds, ratio, is_regression in comparison:
+        mark = ' REGRESSION' if is_regression else ''
+        lines.append(f"{name} {size}: {old_seconds:.4f}s -> {seconds:.4f}s ({ratio:.2f}x){mark}")
+    return '\n'.join(lines)
+
+
+def main(arguments = None) -> int:
+    parser = argparse.ArgumentParser(description='scaling benchmarks on synthetic transactions')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES),
+                        help='comma separated amounts of transactions')
+    parser.add_argument('--benchmarks', default=None,
+                        help=f"comma separated names of {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--all-sizes', action='store_true',
+                        help='do not skip slow benchmarks above their max size')
+    parser.add_argument('--output', default=None, help='json file to save results to')
+    parser.add_argument('--compare', default=None, help='json file of previous results')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio reported as regression')
+    arguments = parser.parse_args(arguments)
+
+    sizes = [int(size) for size in arguments.sizes.split(',')]
+    benchmarks = None
+    if arguments.benchmarks != None:
+        benchmarks = arguments.benchmarks.split(',')
+    max_sizes = {} if arguments.all_sizes else MAX_SIZES
+    results = run(sizes, benchmarks, arguments.repeat, arguments.seed, max_sizes,
+                  log=lambda line: print(line, file=sys.stderr))
+    print(format_results(results))
+    if arguments.output != None:
+        with open(arguments.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if arguments.compare != None:
+        with open(arguments.compare, 'r', encoding='utf-8') as file:
+            comparison = compare(json.load(file), results, arguments.threshold)
+        print(format_comparison(comparison))
+        for row in comparison:
+            if row[5]:
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
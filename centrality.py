@@ -0,0 +1,166 @@
+import numpy as np
+import aggregation
+
+
+class Centrality:
+    '''
+    Amount-weighted PageRank and HITS scores of all accounts
+
+    graph is kept as arrays of unique sender -> recipient pairs,
+        every iteration is one sparse matrix-vector product made with np.bincount
+    '''
+    def __init__(self, chain):
+        '''chain - TrasnsactionsChain or aggregation.ChainAggregates of it'''
+        if isinstance(chain, aggregation.ChainAggregates):
+            aggregates = chain
+        else:
+            aggregates = aggregation.aggregate(chain)
+        self.accounts = aggregates.accounts
+        self.accounts_lookup_table = aggregates.accounts_lookup_table
+        # transactions to self do not move money
+        mask = aggregates.pair_senders != aggregates.pair_recipients
+        self.senders = aggregates.pair_senders[mask]
+        self.recipients = aggregates.pair_recipients[mask]
+        self.amounts = aggregates.pair_amounts[mask]
+        self.iterations = 0 # of the last computation
+
+    def _get_vector(self, weights:dict) -> np.ndarray:
+        '''weights - {username:weight}, returns normalized vector over accounts'''
+        vector = np.zeros(len(self.accounts))
+        for username, weight in weights.items():
+            account_id = self.accounts_lookup_table.get(username)
+            if account_id != None:
+                vector[account_id] = weight
+        total = vector.sum()
+        if total <= 0:
+            raise ValueError('personalization has no weight on accounts of the chain')
+        return vector/total
+
+    def pagerank(self,
+                 damping:float = 0.85,
+                 tolerance:float = 1e-10,
+                 max_iterations:int = 200,
+                 personalization:dict = None,
+                 absorbing = False) -> np.ndarray:
+        '''
+        returns PageRank indexed by account_id, it sums to 1
+
+        accounts pass their rank to recipients in proportion to amounts sent
+        tolerance - L1 change of ranks to stop at
+        personalization - {username:weight} to teleport to instead of all accounts
+        absorbing - accounts that send nothing keep their rank instead of
+            spreading it, so ranks show where money ends up
+        '''
+        accounts_amount = len(self.accounts)
+        if accounts_amount == 0:
+            return np.zeros(0)
+        if personalization != None:
+            teleport = self._get_vector(personalization)
+        else:
+            teleport = np.full(accounts_amount, 1/accounts_amount)
+
+        sent = np.bincount(self.senders, weights=self.amounts, minlength=accounts_amount)
+        shares = np.divide(self.amounts, sent[self.senders],
+                           out=np.zeros(len(self.amounts)), where=sent[self.senders] > 0)
+        sinks = sent <= 0
+
+        ranks = teleport.copy()
+        self.iterations = 0
+        while self.iterations < max_iterations:
+            self.iterations += 1
+            flow = np.bincount(self.recipients, weights=ranks[self.senders]*shares,
+                               minlength=accounts_amount)
+            if absorbing:
+                flow += ranks*sinks
+            else:
+                # rank of accounts that send nothing is spread like teleport
+                flow += ranks[sinks].sum()*teleport
+            new_ranks = damping*flow + (1 - damping)*teleport
+            change = np.abs(new_ranks - ranks).sum()
+            ranks = new_ranks
+            if change < tolerance:
+                break
+        return ranks
+
+    def hits(self, tolerance:float = 1e-10, max_iterations:int = 200) -> tuple:
+        '''
+        returns (hub_scores, authority_scores) indexed by account_id,
+            both have unit length
+
+        good hubs send much to good authorities, e.g. miners and their master
+        '''
+        accounts_amount = len(self.accounts)
+        if accounts_amount == 0:
+            return np.zeros(0), np.zeros(0)
+        hubs = np.full(accounts_amount, 1/np.sqrt(accounts_amount))
+        authorities = np.zeros(accounts_amount)
+        self.iterations = 0
+        while self.iterations < max_iterations:
+            self.iterations += 1
+            authorities = np.bincount(self.recipients, weights=self.amounts*hubs[self.senders],
+                                      minlength=accounts_amount)
+            norm = np.linalg.norm(authorities)
+            if norm > 0:
+                authorities /= norm
+            new_hubs = np.bincount(self.senders, weights=self.amounts*authorities[self.recipients],
+                                   minlength=accounts_amount)
+            norm = np.linalg.norm(new_hubs)
+            if norm > 0:
+                new_hubs /= norm
+            change = np.abs(new_hubs - hubs).sum()
+            hubs = new_hubs
+            if change < tolerance:
+                break
+        return hubs, authorities
+
+    def sink_scores(self, method:str = 'pagerank', **kwargs) -> np.ndarray:
+        '''
+        method - 'pagerank' (absorbing by default) or 'hits' (authority scores)
+        kwargs are passed to the method
+        '''
+        if method == 'pagerank':
+            kwargs.setdefault('absorbing', True)
+            return self.pagerank(**kwargs)
+        elif method == 'hits':
+            return self.hits(**kwargs)[1]
+        raise ValueError(f"unknown centrality method {method!r}")
+
+    def rank(self, usernames:list = None, method:str = 'pagerank', top:int = None, **kwargs) -> list:
+        '''
+        returns list[username, score] sorted by sink score
+
+        usernames - accounts to rank, all accounts by default,
+            accounts not in the chain get 0
+        '''
+        scores = self.sink_scores(method, **kwargs)
+        if usernames == None:
+            order = np.argsort(-scores, kind='stable')
+            if top != None:
+                order = order[:top]
+            return [[self.accounts[account_id], float(scores[account_id])]
+                    for account_id in order.tolist()]
+
+        to_return = []
+        for username in usernames:
+            account_id = self.accounts_lookup_table.get(username)
+            to_return.append([username, 0.0 if account_id == None else float(scores[account_id])])
+        def sorting_criteria(element):
+            return element[1]
+        to_return.sort(key=sorting_criteria, reverse=True)
+        if top != None:
+            to_return = to_return[:top]
+        return to_return
+
+
+def get_main_accounts(chain, candidates:list, method:str = 'pagerank') -> list:
+    '''
+    returns candidates with the highest sink score, several if scores are equal
+
+    chain - TrasnsactionsChain or aggregation.ChainAggregates
+    '''
+    ranked = Centrality(chain).rank(candidates, method)
+    if len(ranked) == 0:
+        return []
+    best_score = ranked[0][1]
+    return [username for username, score in ranked
+            if np.isclose(score, best_score, rtol=1e-9, atol=0.0)]
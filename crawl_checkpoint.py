@@ -0,0 +1,99 @@
+import os
+import time
+
+
+class CrawlCheckpoint:
+    '''
+    Append-only log of crawl state
+
+    every line is one tab separated record:
+        t hash sender recipient amount datetime - fetched transaction
+        q username depth weight - username added to frontier or updated
+        p username - username fetched, written after its transactions
+    '''
+    def __init__(self, path:str, interval:float = 10.0):
+        '''interval - seconds between writes of buffered records'''
+        self.path = path
+        self.interval = interval
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._file = None
+
+    def load(self) -> tuple:
+        '''
+        returns (rows, queued_usernames, processed_usernames),
+            rows are (hash, sender, recipient, amount, datetime),
+            queued_usernames are (username, depth, weight),
+            unfinished last record is ignored
+        '''
+        rows = []
+        queued_usernames = []
+        processed_usernames = []
+        if not os.path.exists(self.path):
+            return rows, queued_usernames, processed_usernames
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.endswith('\n'):
+                    break
+                record = line[:-1].split('\t')
+                if record[0] == 't' and len(record) == 6:
+                    rows.append((record[1], record[2], record[3],
+                                 float(record[4]), int(record[5])))
+                elif record[0] == 'q' and len(record) == 4:
+                    queued_usernames.append((record[1], int(record[2]), float(record[3])))
+                elif record[0] == 'p' and len(record) == 2:
+                    processed_usernames.append(record[1])
+        return rows, queued_usernames, processed_usernames
+
+    def open(self, resume = False):
+        '''starts new log unless resume'''
+        if resume and os.path.exists(self.path):
+            self._truncate_unfinished_record()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+        self._last_flush = time.monotonic()
+
+    def _truncate_unfinished_record(self):
+        with open(self.path, 'rb+') as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            position = size
+            while position > 0:
+                file.seek(position-1)
+                if file.read(1) == b'\n':
+                    break
+                position -= 1
+            if position != size:
+                file.truncate(position)
+
+    def add_queued(self, usernames:list):
+        '''usernames - list[username, depth, weight]'''
+        for username, depth, weight in usernames:
+            self._buffer.append(f"q\t{username}\t{depth}\t{weight!r}\n")
+
+    def add_processed(self, usernames:list, rows:list, queued_usernames:list = ()):
+        '''
+        rows - transactions of usernames that were new to the chain
+        queued_usernames - usernames added to frontier from these rows
+        '''
+        for hash, sender, recipient, amount, datetime in rows:
+            self._buffer.append(f"t\t{hash}\t{sender}\t{recipient}\t{amount!r}\t{datetime}\n")
+        self.add_queued(queued_usernames)
+        for username in usernames:
+            self._buffer.append(f"p\t{username}\n")
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        if len(self._buffer) > 0:
+            self._file.write(''.join(self._buffer))
+            self._file.flush()
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file != None:
+            self.flush()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,144 @@
+from math import inf as infinity
+import transactions_chain
+
+
+class _Frame:
+    '''account on the current path of depth first search'''
+    __slots__ = ('username', 'arrival', 'transactions', 'found', 'clean')
+
+    def __init__(self, username:str, arrival:int, transactions):
+        self.username = username
+        self.arrival = arrival # datetime of transaction that brought money here
+        self.transactions = transactions # iterator of next outgoing transactions
+        self.found = False # cycle was found below
+        # nothing below was cut because of current path or its length,
+        # so no cycle goes through username from arrival or later
+        self.clean = True
+
+
+def _get_latest_departures(chain, root:str, after:int, deadline:int, max_hops:int) -> tuple:
+    '''
+    returns ({username:latest datetime it can send money that reaches root until deadline},
+             {username:fewest transactions to root})
+
+    one backward sweep over transactions after after, paths longer than
+        max_hops transactions are left out
+    '''
+    latest = {}
+    hops = {root:0}
+    for transaction in reversed(chain.search_transactions_by_time(after+1, deadline)):
+        sender = transaction.sender
+        recipient = transaction.recipient
+        if sender == root or sender == recipient:
+            continue
+        recipient_hops = hops.get(recipient)
+        if recipient_hops == None or recipient_hops >= max_hops:
+            continue
+        # money has to leave recipient later than it came
+        if recipient != root and latest[recipient] <= transaction.datetime:
+            continue
+        # sweep goes back in time, so first found departure is the latest
+        if sender not in latest:
+            latest[sender] = transaction.datetime
+        if recipient_hops + 1 < hops.get(sender, max_hops+1):
+            hops[sender] = recipient_hops + 1
+    return latest, hops
+
+
+def _search_cycles(chain, first, deadline:int, min_length:int, max_length:int, latest:dict, hops:dict):
+    '''yields cycles starting with first transaction'''
+    root = first.sender
+    path = [first]
+    on_path = {root, first.recipient}
+    blocked = {} # username:earliest arrival from which no cycle was found
+    def get_outgoing(username:str, arrival:int):
+        return iter(chain.search_transactions_by_sender(username, arrival+1, deadline))
+    stack = [_Frame(first.recipient, first.datetime, get_outgoing(first.recipient, first.datetime))]
+
+    while len(stack) > 0:
+        frame = stack[-1]
+        try:
+            transaction = next(frame.transactions)
+        except StopIteration:
+            stack.pop()
+            path.pop()
+            on_path.discard(frame.username)
+            if not frame.found and frame.clean:
+                blocked[frame.username] = min(blocked.get(frame.username, infinity), frame.arrival)
+            if len(stack) > 0:
+                stack[-1].found = stack[-1].found or frame.found
+                stack[-1].clean = stack[-1].clean and frame.clean
+            continue
+
+        recipient = transaction.recipient
+        length = len(path) + 1
+        if recipient == root:
+            if length >= min_length:
+                frame.found = True
+                yield path + [transaction]
+            else:
+                # longer path through the same accounts can be long enough
+                frame.clean = False
+            continue
+        if recipient == frame.username:
+            continue
+        # arrivals later than latest departure can not get back in time
+        if latest.get(recipient, -infinity) <= transaction.datetime:
+            continue
+        # blocked accounts were searched from earlier arrival, that had more options
+        if transaction.datetime >= blocked.get(recipient, infinity):
+            continue
+        if recipient in on_path or length + hops[recipient] > max_length:
+            frame.clean = False
+            continue
+        path.append(transaction)
+        on_path.add(recipient)
+        stack.append(_Frame(recipient, transaction.datetime,
+                            get_outgoing(recipient, transaction.datetime)))
+
+
+def find_cycles(chain,
+                window:int = 6*60*60,
+                max_length:int = 5,
+                min_length:int = 2,
+                start = None,
+                end = None,
+                usernames = None):
+    '''
+    yields list[transaction] of round trips, money leaves first sender and comes back to it
+
+    every next transaction is sent by recipient of previous one later in time,
+        accounts do not repeat and the last transaction is at most window seconds
+        after the first one
+    every cycle is yielded once, starting with its first transaction,
+        cycles are ordered by datetime of first transaction
+    chain - sorted TrasnsactionsChain
+    min_length, max_length - amounts of transactions in cycle
+    start, end - datetimes all transactions of cycle are between,
+        as in TrasnsactionsChain.search_transactions_by_time
+    usernames - accounts cycles have to start at, all by default
+    '''
+    if not chain.sort:
+        raise ValueError('chain is not sorted by time')
+    if min_length < 2:
+        min_length = 2
+    end = transactions_chain._to_timestamp(end)
+    if usernames != None:
+        usernames = set(usernames)
+
+    for first in chain.search_transactions_by_time(start, end):
+        root = first.sender
+        if root == first.recipient:
+            continue
+        if usernames != None and root not in usernames:
+            continue
+        deadline = first.datetime + window
+        if end != None and end < deadline:
+            deadline = end
+        # most accounts get nothing back in time, it is one bisection to check
+        if len(chain.search_transactions_by_recipient(root, first.datetime+1, deadline)) == 0:
+            continue
+        latest, hops = _get_latest_departures(chain, root, first.datetime, deadline, max_length-1)
+        if latest.get(first.recipient, -infinity) <= first.datetime:
+            continue
+        yield from _search_cycles(chain, first, deadline, min_length, max_length, latest, hops)
@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+import urllib.parse
+
+
+class FetchError(Exception):
+    '''raised when user transactions can not be fetched'''
+    def __init__(self, url:str, attempts:int, reason:str, status_code = None):
+        super().__init__(f"failed to fetch {url} after {attempts} attempts: {reason}")
+        self.url = url
+        self.attempts = attempts
+        self.reason = reason
+        self.status_code = status_code
+
+
+class RetryPolicy:
+    '''
+    Exponential backoff with full jitter
+
+    delay before attempt n is random between 0 and min(max_delay, base_delay*2**n)
+    '''
+    def __init__(self,
+                 max_attempts:int = 10,
+                 base_delay:float = 0.5,
+                 max_delay:float = 60.0,
+                 timeout:float = 30.0):
+        '''
+        max_attempts - attempts before FetchError is raised, None for no limit
+        timeout - seconds to wait for connection and every chunk of response
+        '''
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+    def get_delay(self, attempt:int, retry_after = None) -> float:
+        '''retry_after - seconds requested by server, used if longer'''
+        # 2**attempt does not fit into float after about 1000 attempts
+        delay = random.uniform(0, min(self.max_delay, self.base_delay*2**min(attempt, 62)))
+        if retry_after != None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def can_retry(self, attempts:int) -> bool:
+        return self.max_attempts == None or attempts < self.max_attempts
+
+    @staticmethod
+    def is_retryable(status_code:int) -> bool:
+        '''requests are retried on rate limiting, timeouts and server errors'''
+        return status_code in (408, 429) or status_code >= 500
+
+
+def parse_retry_after(value) -> float:
+    '''returns seconds from Retry-After header, None if missing or not seconds'''
+    if value == None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    '''
+    Thread safe token bucket with adaptive rate
+
+    rate is halved on throttling and increased by increase
+        on every successful request until max_rate
+    '''
+    def __init__(self,
+                 rate:float,
+                 capacity = None,
+                 min_rate:float = 0.5,
+                 increase:float = 0.5):
+        '''
+        rate - requests per second, also max rate
+        capacity - max burst of requests, rate by default
+        '''
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.increase = increase
+        self.capacity = capacity if capacity != None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated)*self.rate)
+        self._updated = now
+
+    def acquire(self):
+        '''blocks until request can be sent'''
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens)/self.rate
+            time.sleep(wait)
+
+    def slow_down(self, pause = None):
+        '''
+        halves rate after throttling response
+
+        pause - seconds no requests are sent, e.g. Retry-After of response
+        '''
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate/2)
+            self.tokens = min(self.tokens, 0.0)
+            if pause != None:
+                self.tokens = min(self.tokens, -pause*self.rate)
+
+    def speed_up(self):
+        with self._lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RateLimiter:
+    '''TokenBucket per host'''
+    def __init__(self,
+                 rate:float = 20.0,
+                 capacity = None,
+                 min_rate:float = 0.5,
+                 increase:float = 0.5):
+        '''arguments are used for TokenBucket of every host'''
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.increase = increase
+        self.buckets = {} # host:TokenBucket
+        self._lock = threading.Lock()
+
+    def get_bucket(self, url:str) -> TokenBucket:
+        host = urllib.parse.urlsplit(url).netloc
+        with self._lock:
+            bucket = self.buckets.get(host)
+            if bucket == None:
+                bucket = TokenBucket(self.rate, self.capacity, self.min_rate, self.increase)
+                self.buckets[host] = bucket
+            return bucket
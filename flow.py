@@ -0,0 +1,214 @@
+import collections
+
+
+class _ProportionalBalances:
+    '''every payment carries tainted share of the whole balance'''
+    def __init__(self):
+        self.balances = {} # username:amount recieved and not sent
+        self.tainted = {} # username:tainted amount held
+
+    def deposit(self, username:str, amount:float, tainted:float):
+        self.balances[username] = self.balances.get(username, 0.0) + amount
+        if tainted > 0:
+            self.tainted[username] = self.tainted.get(username, 0.0) + tainted
+
+    def withdraw(self, username:str, amount:float) -> float:
+        '''returns tainted part of amount'''
+        balance = self.balances.get(username, 0.0)
+        self.balances[username] = max(balance - amount, 0.0)
+        held = self.tainted.get(username)
+        if held == None:
+            return 0.0
+        # money above known balance was recieved before tracing, it is clean
+        tainted = min(held, amount*held/max(balance, amount))
+        if held - tainted > 0:
+            self.tainted[username] = held - tainted
+        else:
+            del self.tainted[username]
+        return tainted
+
+    def get_held(self) -> dict:
+        return dict(self.tainted)
+
+
+class _FifoBalances:
+    '''payments spend the oldest recieved money first'''
+    def __init__(self):
+        # most accounts never get tainted money, their balance is one number
+        self.clean = {} # username:amount recieved and not sent
+        self.lots = {} # username:deque[amount, tainted_amount] in order of recieving
+
+    def deposit(self, username:str, amount:float, tainted:float):
+        lots = self.lots.get(username)
+        if lots == None:
+            if tainted == 0:
+                self.clean[username] = self.clean.get(username, 0.0) + amount
+                return
+            lots = collections.deque()
+            balance = self.clean.pop(username, 0.0)
+            if balance > 0:
+                lots.append([balance, 0.0])
+            self.lots[username] = lots
+        if tainted == 0 and len(lots) > 0 and lots[-1][1] == 0:
+            # clean lots in a row are spent the same way
+            lots[-1][0] += amount
+        else:
+            lots.append([amount, tainted])
+
+    def withdraw(self, username:str, amount:float) -> float:
+        '''returns tainted part of amount'''
+        lots = self.lots.get(username)
+        if lots == None:
+            balance = self.clean.get(username)
+            if balance != None:
+                self.clean[username] = max(balance - amount, 0.0)
+            return 0.0
+        tainted = 0.0
+        while amount > 0 and len(lots) > 0:
+            lot = lots[0]
+            if lot[0] <= amount:
+                amount -= lot[0]
+                tainted += lot[1]
+                lots.popleft()
+            else:
+                part = lot[1]*amount/lot[0]
+                tainted += part
+                lot[0] -= amount
+                lot[1] -= part
+                amount = 0
+        # rest is paid with money recieved before tracing, it is clean
+        return tainted
+
+    def get_held(self) -> dict:
+        to_return = {}
+        for username, lots in self.lots.items():
+            held = sum(lot[1] for lot in lots)
+            if held > 0:
+                to_return[username] = held
+        return to_return
+
+
+class FlowTrace:
+    '''Accounts reached by money of source, result of trace_flow'''
+    def __init__(self, source:str, start, attribution:str):
+        self.source = source
+        self.start = start
+        self.attribution = attribution
+        self.sent = 0.0 # tainted amount sent by source
+        self.reached = {} # username:tainted amount recieved
+        # every account money could reach by transactions going forward in time,
+        # it can have no tainted amount under fifo attribution
+        self.first_reached = {} # username:datetime of earliest arrival
+        self.hops = {source:0} # username:fewest transactions from source
+        self.held = {} # username:tainted amount held after last transaction
+        self.edges = {} # sender:{recipient:tainted amount}
+
+    def __len__(self):
+        return len(self.first_reached)
+
+    def __contains__(self, username:str):
+        return username in self.first_reached
+
+    def __repr__(self):
+        return f"<FlowTrace {self.source} | {len(self.first_reached)} accounts reached | {self.sent} sent>"
+
+    def get_reached(self, top = None) -> list:
+        '''returns list[username, tainted_amount_recieved] sorted by amount'''
+        def sorting_criteria(element):
+            return element[1]
+        to_return = sorted(self.reached.items(), key=sorting_criteria, reverse=True)
+        if top != None:
+            to_return = to_return[:top]
+        return [list(element) for element in to_return]
+
+    def get_holders(self, top = None) -> list:
+        '''returns list[username, tainted_amount_held] sorted by amount'''
+        def sorting_criteria(element):
+            return element[1]
+        to_return = sorted(self.held.items(), key=sorting_criteria, reverse=True)
+        if top != None:
+            to_return = to_return[:top]
+        return [list(element) for element in to_return]
+
+
+def trace_flow(chain,
+               source:str,
+               start = None,
+               end = None,
+               amount:float = None,
+               attribution:str = 'proportional',
+               min_amount:float = 1e-8) -> FlowTrace:
+    '''
+    follows money of source forward in time in one sweep over sorted chain
+
+    money recieved at some second can be sent only at later seconds
+    chain - sorted TrasnsactionsChain
+    start, end - as in TrasnsactionsChain.search_transactions_by_time
+    amount - tainted balance of source at start,
+        None if everything source sends is tainted
+    attribution - 'proportional' (every payment carries tainted share of balance)
+        or 'fifo' (payments spend the oldest recieved money first),
+        balances before start are unknown and treated as clean
+    min_amount - smaller tainted parts of payments are dropped
+    '''
+    if attribution == 'proportional':
+        balances = _ProportionalBalances()
+    elif attribution == 'fifo':
+        balances = _FifoBalances()
+    else:
+        raise ValueError(f"unknown attribution {attribution!r}")
+    if not chain.sort:
+        raise ValueError('chain is not sorted by time')
+
+    trace = FlowTrace(source, start, attribution)
+    if amount != None:
+        balances.deposit(source, amount, amount)
+
+    reached = trace.reached
+    hops = trace.hops
+    edges = trace.edges
+    credits = [] # (sender, recipient, amount, tainted, sender_hops) of current second
+    def apply_credits(datetime:int):
+        # recipients can send recieved money only from the next second
+        for sender, recipient, value, tainted, sender_hops in credits:
+            if recipient != source or amount != None:
+                balances.deposit(recipient, value, tainted)
+            if sender_hops != None:
+                if recipient not in hops:
+                    trace.first_reached[recipient] = datetime
+                    hops[recipient] = sender_hops + 1
+                elif sender_hops + 1 < hops[recipient]:
+                    hops[recipient] = sender_hops + 1
+            if tainted == 0:
+                continue
+            reached[recipient] = reached.get(recipient, 0.0) + tainted
+            recipients = edges.setdefault(sender, {})
+            recipients[recipient] = recipients.get(recipient, 0.0) + tainted
+        credits.clear()
+
+    current_datetime = None
+    for transaction in chain.search_transactions_by_time(start, end):
+        if transaction.datetime != current_datetime:
+            apply_credits(current_datetime)
+            current_datetime = transaction.datetime
+        sender = transaction.sender
+        recipient = transaction.recipient
+        if sender == recipient:
+            continue
+        value = transaction.amount
+        if sender == source and amount == None:
+            # money coming back to such source is not tracked
+            tainted = value
+        else:
+            tainted = balances.withdraw(sender, value)
+        if tainted < min_amount:
+            tainted = 0.0
+        if sender == source:
+            trace.sent += tainted
+        credits.append((sender, recipient, value, tainted, hops.get(sender)))
+    apply_credits(current_datetime)
+
+    for username, held in balances.get_held().items():
+        if held >= min_amount:
+            trace.held[username] = held
+    return trace
@@ -0,0 +1,286 @@
+import bisect
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+from math import inf as infinity
+
+
+# Stats of enabled instrumentation, hot paths check it for None only
+STATS = None
+
+# upper bounds of latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+                   0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    '''counts of values in buckets with fixed upper bounds'''
+    def __init__(self, bounds = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0]*(len(bounds)+1) # last one is above all bounds
+        self.count = 0
+        self.total = 0.0
+        self.min = infinity
+        self.max = 0.0
+
+    def add(self, value:float):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, share:float) -> float:
+        '''returns upper bound of bucket with share of values below it'''
+        if self.count == 0:
+            return 0.0
+        rank = share*self.count
+        seen = 0
+        for index, amount in enumerate(self.buckets):
+            seen += amount
+            if seen >= rank and amount > 0:
+                if index == len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def report(self) -> dict:
+        buckets = {}
+        for index, amount in enumerate(self.buckets):
+            if index < len(self.bounds):
+                buckets[f"<={self.bounds[index]}"] = amount
+            else:
+                buckets[f">{self.bounds[-1]}"] = amount
+        return {'count':self.count,
+                'total':self.total,
+                'mean':self.total/self.count if self.count > 0 else 0.0,
+                'min':self.min if self.count > 0 else 0.0,
+                'max':self.max,
+                'p50':self.percentile(0.5),
+                'p90':self.percentile(0.9),
+                'p99':self.percentile(0.99),
+                'buckets':buckets}
+
+
+class TimedIterator:
+    '''wraps iterator and sums seconds spent in its __next__'''
+    __slots__ = ('iterator', 'seconds')
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+class _Timer:
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats, stage:str):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stats.add_time(self.stage, time.perf_counter() - self.start)
+
+
+class Stats:
+    '''
+    Stage timers, counters and histograms of one run
+
+    thread safe, stages of different threads overlap,
+        so their sum can be above elapsed time
+    '''
+    def __init__(self):
+        self.timers = {} # stage:[calls, seconds]
+        self.counters = collections.Counter() # name:amount
+        self.histograms = {} # name:Histogram
+        self.profiler = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def time(self, stage:str) -> _Timer:
+        '''context manager adding its duration to stage'''
+        return _Timer(self, stage)
+
+    def add_time(self, stage:str, seconds:float, calls = 1):
+        with self._lock:
+            timer = self.timers.get(stage)
+            if timer == None:
+                self.timers[stage] = [calls, seconds]
+            else:
+                timer[0] += calls
+                timer[1] += seconds
+
+    def count(self, name:str, amount = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def observe(self, name:str, value:float):
+        '''adds value to histogram name'''
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram == None:
+                histogram = Histogram()
+                self.histograms[name] = histogram
+            histogram.add(value)
+
+    def report(self) -> dict:
+        '''
+        returns {'elapsed':seconds,
+                 'stages':{stage:{'calls', 'seconds', 'share'}},
+                 'counters':{name:amount},
+                 'histograms':{name:Histogram.report()},
+                 'profile':profiler report or None}
+        '''
+        finished = self.finished if self.finished != None else time.perf_counter()
+        elapsed = finished - self.started
+        with self._lock:
+            stages = {}
+            for stage, (calls, seconds) in self.timers.items():
+                stages[stage] = {'calls':calls,
+                                 'seconds':seconds,
+                                 'share':seconds/elapsed if elapsed > 0 else 0.0}
+            counters = dict(self.counters)
+            histograms = {name:histogram.report() for name, histogram in self.histograms.items()}
+        profile = None
+        if self.profiler != None:
+            profile = self.profiler.report()
+        return {'elapsed':elapsed,
+                'stages':stages,
+                'counters':counters,
+                'histograms':histograms,
+                'profile':profile}
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"elapsed: {report['elapsed']:.3f}s"]
+        def sorting_criteria(element):
+            return element[1]['seconds']
+        for stage, timer in sorted(report['stages'].items(), key=sorting_criteria, reverse=True):
+            lines.append(f"  {stage}: {timer['seconds']:.3f}s in {timer['calls']} calls"
+                         f" ({timer['share']*100:.1f}%)")
+        for name, amount in sorted(report['counters'].items()):
+            lines.append(f"  {name}: {amount}")
+        for name, histogram in report['histograms'].items():
+            lines.append(f"  {name}: p50 {histogram['p50']}s | p90 {histogram['p90']}s"
+                         f" | p99 {histogram['p99']}s | max {histogram['max']:.3f}s")
+        if report['profile'] != None:
+            lines.append('  profile (function: own samples / total samples):')
+            for function, own, total in report['profile']:
+                lines.append(f"    {function}: {own} / {total}")
+        return '\n'.join(lines)
+
+
+class SamplingProfiler:
+    '''
+    Samples stacks of all other threads every interval seconds
+
+    any object with start(), stop() and report() can be used instead
+    '''
+    def __init__(self, interval:float = 0.005, top:int = 20):
+        self.interval = interval
+        self.top = top
+        self.own_samples = collections.Counter() # function:samples on top of stack
+        self.total_samples = collections.Counter() # function:samples anywhere in stack
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _get_function(code) -> str:
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _sample(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread, frame in sys._current_frames().items():
+                if thread == own_thread:
+                    continue
+                self.own_samples[self._get_function(frame.f_code)] += 1
+                functions = set()
+                while frame != None:
+                    functions.add(self._get_function(frame.f_code))
+                    frame = frame.f_back
+                for function in functions:
+                    self.total_samples[function] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='sampling profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread != None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self) -> list:
+        '''returns list[function, own_samples, total_samples] of top functions by own samples'''
+        return [[function, own, self.total_samples[function]]
+                for function, own in self.own_samples.most_common(self.top)]
+
+
+_NO_TIMER = contextlib.nullcontext()
+
+def time_stage(stage:str):
+    '''timer of stage in enabled Stats, does nothing if instrumentation is disabled'''
+    if STATS == None:
+        return _NO_TIMER
+    return STATS.time(stage)
+
+def enable(profile = False, profiler = None) -> Stats:
+    '''
+    starts collecting into new Stats
+
+    profile - sample stacks with SamplingProfiler
+    profiler - custom profiler with start(), stop() and report()
+    '''
+    global STATS
+    stats = Stats()
+    if profiler == None and profile:
+        profiler = SamplingProfiler()
+    if profiler != None:
+        stats.profiler = profiler
+        profiler.start()
+    STATS = stats
+    return stats
+
+def disable() -> Stats:
+    '''stops collecting, returns collected Stats'''
+    global STATS
+    stats = STATS
+    STATS = None
+    if stats != None:
+        stats.finished = time.perf_counter()
+        if stats.profiler != None:
+            stats.profiler.stop()
+    return stats
+
+@contextlib.contextmanager
+def collect(profile = False, profiler = None):
+    '''with collect() as stats: collects stats inside the block'''
+    global STATS
+    previous = STATS
+    stats = enable(profile, profiler)
+    try:
+        yield stats
+    finally:
+        disable()
+        STATS = previous
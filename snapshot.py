@@ -0,0 +1,460 @@
+import array
+import mmap
+import struct
+import sys
+import Graph
+import transactions_chain
+
+
+MAGIC = b'GRATKASN'
+VERSION = 3
+
+FLAG_SORTED = 1
+FLAG_GRAPH = 2
+FLAG_BIG_ENDIAN = 4
+
+# sections in file order, every section starts at multiple of 8
+SECTIONS = ('root',
+            'account_offsets', 'account_data',
+            'hash_data', 'other_hash_rows', 'other_hash_offsets', 'other_hash_data',
+            'senders', 'recipients', 'amounts', 'datetimes',
+            'sender_offsets', 'sender_rows', 'recipient_offsets', 'recipient_rows',
+            'hash_table',
+            'node_offsets', 'node_data',
+            'outgoing_offsets', 'outgoing_nodes', 'outgoing_amounts',
+            'incoming_offsets', 'incoming_nodes', 'incoming_amounts')
+
+# array typecodes of columns, native byte order
+SECTION_TYPES = {'account_offsets':'q',
+                 'other_hash_rows':'i',
+                 'other_hash_offsets':'q',
+                 'senders':'i',
+                 'recipients':'i',
+                 'amounts':'d',
+                 'datetimes':'q',
+                 'sender_offsets':'q',
+                 'sender_rows':'i',
+                 'recipient_offsets':'q',
+                 'recipient_rows':'i',
+                 'hash_table':'i',
+                 'node_offsets':'q',
+                 'outgoing_offsets':'q',
+                 'outgoing_nodes':'i',
+                 'outgoing_amounts':'q',
+                 'incoming_offsets':'q',
+                 'incoming_nodes':'i',
+                 'incoming_amounts':'q'}
+
+_HEADER = struct.Struct('<8sII' + 'qq'*len(SECTIONS))
+
+
+def _build_strings(strings) -> tuple:
+    '''returns (offsets:array, data:bytes) of string table'''
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array.array('q', [0])
+    position = 0
+    for value in encoded:
+        position += len(value)
+        offsets.append(position)
+    return offsets, b''.join(encoded)
+
+def _build_adjacency(adjacency:list) -> tuple:
+    '''returns (offsets, nodes, amounts) arrays of {node:amount} per node'''
+    offsets = array.array('q', [0])
+    nodes = array.array('i')
+    amounts = array.array('q')
+    for connections in adjacency:
+        nodes.extend(connections.keys())
+        amounts.extend(connections.values())
+        offsets.append(len(nodes))
+    return offsets, nodes, amounts
+
+def _build_index(account_ids, accounts_amount:int) -> tuple:
+    '''returns (offsets, rows) arrays of rows per account, rows are in order'''
+    rows_per_account = [[] for _ in range(accounts_amount)]
+    for row, account_id in enumerate(account_ids):
+        rows_per_account[account_id].append(row)
+    offsets = array.array('q', [0])
+    rows = array.array('i')
+    for account_rows in rows_per_account:
+        rows.extend(account_rows)
+        offsets.append(len(rows))
+    return offsets, rows
+
+def save_snapshot(chain, path:str, graph = None):
+    '''
+    writes transactions of chain and graph to binary snapshot
+
+    graph - Graph to save, chain.graph by default, not saved if both are None
+    '''
+    if graph == None:
+        graph = chain.graph
+
+    accounts = [] # account_id:username
+    accounts_lookup_table = {} # username:account_id
+    def get_account_id(username:str) -> int:
+        account_id = accounts_lookup_table.get(username)
+        if account_id == None:
+            account_id = len(accounts)
+            accounts.append(username)
+            accounts_lookup_table[username] = account_id
+        return account_id
+
+    sections = {'root':chain.root_username.encode('utf-8'),
+                'senders':array.array('i'),
+                'recipients':array.array('i'),
+                'amounts':array.array('d'),
+                'datetimes':array.array('q')}
+    hashes = transactions_chain.HashColumn()
+    for transaction in chain.transactions:
+        sections['senders'].append(get_account_id(transaction.sender))
+        sections['recipients'].append(get_account_id(transaction.recipient))
+        sections['amounts'].append(transaction.amount)
+        sections['datetimes'].append(transaction.datetime)
+        hashes.append(transaction.hash)
+    sections['account_offsets'], sections['account_data'] = _build_strings(accounts)
+    sections['sender_offsets'], sections['sender_rows'] = \
+        _build_index(sections['senders'], len(accounts))
+    sections['recipient_offsets'], sections['recipient_rows'] = \
+        _build_index(sections['recipients'], len(accounts))
+    # table is probed with crc32 of hashes, so it is valid in every process
+    hash_rows = transactions_chain._HashRows(hashes)
+    for row in range(len(hashes)):
+        hash_rows.add_row(row)
+    sections['hash_table'] = hash_rows.table
+    sections['hash_data'] = hashes.data
+    sections['other_hash_rows'] = array.array('i', hashes.other.keys())
+    sections['other_hash_offsets'], sections['other_hash_data'] = _build_strings(hashes.other.values())
+
+    flags = 0
+    if chain.sort:
+        flags |= FLAG_SORTED
+    if sys.byteorder == 'big':
+        flags |= FLAG_BIG_ENDIAN
+    if graph != None:
+        flags |= FLAG_GRAPH
+        sections['node_offsets'], sections['node_data'] = _build_strings(graph.nodes)
+        sections['outgoing_offsets'], sections['outgoing_nodes'],\
+            sections['outgoing_amounts'] = _build_adjacency(graph.outgoing)
+        sections['incoming_offsets'], sections['incoming_nodes'],\
+            sections['incoming_amounts'] = _build_adjacency(graph.incoming)
+
+    positions = []
+    position = _HEADER.size
+    for name in SECTIONS:
+        data = sections.get(name, b'')
+        length = len(data)*getattr(data, 'itemsize', 1)
+        position += -position % 8
+        positions.extend((position, length))
+        position += length
+
+    with open(path, 'wb') as file:
+        file.write(_HEADER.pack(MAGIC, VERSION, flags, *positions))
+        for name in SECTIONS:
+            data = sections.get(name, b'')
+            file.write(b'\0'*(-file.tell() % 8))
+            file.write(data)
+
+
+class MappedStrings:
+    '''read-only list of strings of snapshot string table'''
+    def __init__(self, offsets:memoryview, data:memoryview):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index:int) -> str:
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('string index out of range')
+        return str(self._data[self._offsets[index]:self._offsets[index+1]], 'utf-8')
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class MappedColumns(transactions_chain.TransactionsColumns):
+    '''
+    Read-only TransactionsColumns backed by snapshot pages
+
+    columns are memoryviews of mmap, nothing is copied on load
+    '''
+    def __init__(self, accounts:MappedStrings, senders:memoryview, recipients:memoryview,
+                 amounts:memoryview, datetimes:memoryview,
+                 hashes:transactions_chain.HashColumn, sorted = False):
+        '''sorted - rows are sorted by datetime'''
+        self.accounts = accounts
+        self.senders = senders
+        self.recipients = recipients
+        self.amounts = amounts
+        self.datetimes = datetimes
+        self.hashes = hashes
+        self.order = range(len(senders))
+        self.sorted = sorted
+        self._accounts_lookup_table = None
+
+    @property
+    def accounts_lookup_table(self) -> dict:
+        '''username:account_id, built on first use'''
+        if self._accounts_lookup_table == None:
+            self._accounts_lookup_table = {}
+            for account_id, username in enumerate(self.accounts):
+                self._accounts_lookup_table[sys.intern(username)] = account_id
+        return self._accounts_lookup_table
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('snapshot columns are read-only')
+    append = extend = merge = insert = sort = _read_only
+
+    def sort_by_datetime(self):
+        '''rows of sorted snapshot are already in order'''
+        if not self.sorted:
+            raise TypeError('snapshot columns are read-only and not sorted')
+
+    def to_columns(self) -> transactions_chain.TransactionsColumns:
+        '''returns writable copy'''
+        columns = transactions_chain.TransactionsColumns()
+        columns.accounts = [sys.intern(username) for username in self.accounts]
+        columns.accounts_lookup_table = {username:account_id
+                                         for account_id, username in enumerate(columns.accounts)}
+        columns.senders.frombytes(self.senders.cast('B'))
+        columns.recipients.frombytes(self.recipients.cast('B'))
+        columns.amounts.frombytes(self.amounts.cast('B'))
+        columns.datetimes.frombytes(self.datetimes.cast('B'))
+        columns.hashes = transactions_chain.HashColumn(bytearray(self.hashes.data),
+                                                       dict(self.hashes.other))
+        columns.order = array.array('i', self.order)
+        return columns
+
+
+class MappedIndex:
+    '''
+    read-only {username:rows} of chain index stored as offsets and rows arrays,
+        rows of every account are in order of columns
+    '''
+    def __init__(self, columns:MappedColumns, offsets:memoryview, rows:memoryview):
+        self._columns = columns
+        self._offsets = offsets
+        self._rows = rows
+
+    def get(self, username:str, default = None):
+        account_id = self._columns.accounts_lookup_table.get(username)
+        if account_id == None:
+            return default
+        start = self._offsets[account_id]
+        end = self._offsets[account_id+1]
+        if start == end:
+            return default
+        return self._rows[start:end]
+
+    def items(self):
+        '''yields (username, rows) of accounts with rows'''
+        for account_id, username in enumerate(self._columns.accounts):
+            start = self._offsets[account_id]
+            end = self._offsets[account_id+1]
+            if start != end:
+                yield username, self._rows[start:end]
+
+
+class MappedAdjacency:
+    '''read-only list of {node:amount} stored as offsets, nodes and amounts arrays'''
+    def __init__(self, offsets:memoryview, nodes:memoryview, amounts:memoryview):
+        self._offsets = offsets
+        self._nodes = nodes
+        self._amounts = amounts
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index:int) -> dict:
+        start = self._offsets[index]
+        end = self._offsets[index+1]
+        return dict(zip(self._nodes[start:end], self._amounts[start:end]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+class MappedGraph(Graph.Graph):
+    '''read-only Graph backed by snapshot pages'''
+    def __init__(self, nodes:MappedStrings, outgoing:MappedAdjacency, incoming:MappedAdjacency):
+        self.nodes = nodes
+        self.outgoing = outgoing
+        self.incoming = incoming
+        self._nodes_lookup_table = None
+
+    @property
+    def nodes_lookup_table(self) -> dict:
+        '''node_name:index, built on first use'''
+        if self._nodes_lookup_table == None:
+            self._nodes_lookup_table = {}
+            for index, name in enumerate(self.nodes):
+                self._nodes_lookup_table[sys.intern(name)] = index
+        return self._nodes_lookup_table
+
+    def add_node(self, name:str) -> int:
+        index = self.nodes_lookup_table.get(name)
+        if index == None:
+            raise TypeError('snapshot graph is read-only')
+        return index
+
+    def add_edge(self, sender:int, recipient:int, amount:int = 1):
+        raise TypeError('snapshot graph is read-only')
+
+    def to_graph(self) -> Graph.Graph:
+        '''returns writable copy'''
+        return Graph.Graph([sys.intern(name) for name in self.nodes],
+                           list(self.outgoing),
+                           list(self.incoming))
+
+
+class Snapshot:
+    '''
+    Snapshot opened with load_snapshot
+
+    pages are shared between all processes that opened the same file
+    '''
+    def __init__(self, path:str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self._views = []
+
+        header = _HEADER.unpack_from(self._mmap)
+        magic, version, flags = header[:3]
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a transactions snapshot")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"unsupported snapshot version {version}")
+        if bool(flags & FLAG_BIG_ENDIAN) != (sys.byteorder == 'big'):
+            self.close()
+            raise ValueError('snapshot was saved with other byte order')
+        self.sorted = bool(flags & FLAG_SORTED)
+
+        positions = header[3:]
+        sections = {}
+        for index, name in enumerate(SECTIONS):
+            offset = positions[index*2]
+            length = positions[index*2+1]
+            view = self._buffer[offset:offset+length]
+            if name in SECTION_TYPES:
+                view = view.cast(SECTION_TYPES[name])
+            self._views.append(view)
+            sections[name] = view
+
+        self.root_username = str(sections['root'], 'utf-8')
+        # hashes that are not hex are rare, they are read into dict
+        other_hashes = dict(zip(sections['other_hash_rows'],
+                                MappedStrings(sections['other_hash_offsets'],
+                                              sections['other_hash_data'])))
+        self.transactions = MappedColumns(MappedStrings(sections['account_offsets'],
+                                                        sections['account_data']),
+                                          sections['senders'],
+                                          sections['recipients'],
+                                          sections['amounts'],
+                                          sections['datetimes'],
+                                          transactions_chain.HashColumn(sections['hash_data'],
+                                                                        other_hashes),
+                                          self.sorted)
+        self._sender_index = MappedIndex(self.transactions,
+                                         sections['sender_offsets'],
+                                         sections['sender_rows'])
+        self._recipient_index = MappedIndex(self.transactions,
+                                            sections['recipient_offsets'],
+                                            sections['recipient_rows'])
+        # size is only used to grow table, mapped table is never changed
+        self._hash_index = transactions_chain._HashRows(self.transactions.hashes,
+                                                        sections['hash_table'],
+                                                        len(self.transactions))
+        self.graph = None
+        if flags & FLAG_GRAPH:
+            self.graph = MappedGraph(MappedStrings(sections['node_offsets'],
+                                                   sections['node_data']),
+                                     MappedAdjacency(sections['outgoing_offsets'],
+                                                     sections['outgoing_nodes'],
+                                                     sections['outgoing_amounts']),
+                                     MappedAdjacency(sections['incoming_offsets'],
+                                                     sections['incoming_nodes'],
+                                                     sections['incoming_amounts']))
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __iter__(self):
+        return iter(self.transactions)
+
+    def __repr__(self):
+        return f"<Snapshot {self.root_username} | {len(self.transactions)} transactions>"
+
+    def to_chain(self, columnar = True, keep_graph = False, copy = True) -> transactions_chain.TrasnsactionsChain:
+        '''
+        copies snapshot into new TrasnsactionsChain, takes linear time
+
+        keep_graph - copy graph of snapshot into chain.graph,
+            it is created if snapshot has no graph
+        copy - False for read-only columnar chain over snapshot pages
+            with indexes of snapshot, it takes constant time,
+            the chain must be deleted before snapshot is closed
+        '''
+        if not copy:
+            if not columnar:
+                raise ValueError('only columnar chain can share snapshot pages')
+            graph = None
+            if keep_graph:
+                graph = self.graph
+            chain = transactions_chain.TrasnsactionsChain.from_indexes(self.root_username,
+                                                                       self.transactions,
+                                                                       self._sender_index,
+                                                                       self._recipient_index,
+                                                                       self._hash_index,
+                                                                       self.sorted,
+                                                                       graph)
+            if keep_graph and graph == None:
+                chain.create_graph()
+            return chain
+
+        if columnar:
+            transactions = self.transactions.to_columns()
+        else:
+            transactions = [transactions_chain.Transaction.from_row(transaction.to_row())
+                            for transaction in self.transactions]
+        # rows are saved in chain order, so they are indexed in order without sorting
+        chain = transactions_chain.TrasnsactionsChain(self.root_username,
+                                                      transactions,
+                                                      sort = False,
+                                                      columnar = columnar)
+        chain.sort = self.sorted
+        if keep_graph:
+            if self.graph != None:
+                chain.graph = self.graph.to_graph()
+            else:
+                chain.create_graph()
+        return chain
+
+    def close(self):
+        '''all views of columns must be released before'''
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._buffer.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_snapshot(path:str) -> Snapshot:
+    '''maps snapshot into memory, nothing is read until used'''
+    return Snapshot(path)
@@ -0,0 +1,251 @@
+import datetime
+import http.server
+import itertools
+import json
+import random
+import threading
+import time
+import transactions_chain
+
+
+DATETIME_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+
+class SyntheticDataset:
+    '''
+    Generated transactions in API format with known structure
+
+    masters - farm master accounts, farms[master] are its workers
+    one_way_chains - list of account lists, every account sends only to the next one
+    '''
+    def __init__(self, transactions:list, hubs:list, farms:dict, one_way_chains:list, seed:int):
+        self.transactions = transactions # raw dicts as in API "result"
+        self.hubs = hubs
+        self.farms = farms # master:[worker]
+        self.masters = list(farms)
+        self.one_way_chains = one_way_chains
+        self.seed = seed
+        self._by_user = None
+
+    def __len__(self):
+        return len(self.transactions)
+
+    def __repr__(self):
+        return f"<SyntheticDataset {len(self.transactions)} transactions | {len(self.farms)} farms>"
+
+    def by_user(self) -> dict:
+        '''returns {username:[raw transaction]} as served by user_transactions'''
+        if self._by_user == None:
+            self._by_user = {}
+            for transaction in self.transactions:
+                self._by_user.setdefault(transaction['sender'], []).append(transaction)
+                if transaction['recipient'] != transaction['sender']:
+                    self._by_user.setdefault(transaction['recipient'], []).append(transaction)
+        return self._by_user
+
+    def usernames(self) -> list:
+        return list(self.by_user())
+
+    def to_transactions(self) -> list:
+        '''returns list[transactions_chain.Transaction]'''
+        return [transactions_chain.Transaction(transaction['hash'], transaction)
+                for transaction in self.transactions]
+
+    def to_chain(self, root_username = None, **kwargs) -> transactions_chain.TrasnsactionsChain:
+        '''kwargs are passed to TrasnsactionsChain'''
+        if root_username == None:
+            root_username = self.masters[0] if len(self.masters) > 0 else self.transactions[0]['sender']
+        return transactions_chain.TrasnsactionsChain(root_username, self.to_transactions(), **kwargs)
+
+
+def generate(transactions_amount:int,
+             seed:int = 0,
+             users_amount:int = None,
+             hubs_amount:int = 10,
+             power:float = 1.1,
+             farms_amount:int = None,
+             farm_size:int = 20,
+             farm_share:float = 0.15,
+             chains_amount:int = None,
+             chain_length:int = 6,
+             chain_share:float = 0.05,
+             start:datetime.datetime = datetime.datetime(2022, 1, 1),
+             days:int = 365) -> SyntheticDataset:
+    '''
+    deterministic DuinoCoin-like transactions
+
+    background transactions pick senders and recipients with power-law
+        probabilities, so first hubs_amount accounts become hubs
+    farm_share of transactions go from farm workers to their master
+    chain_share of transactions go along one-way chains
+    users_amount - background accounts, transactions_amount//10 by default
+    '''
+    rng = random.Random(seed)
+    if users_amount == None:
+        users_amount = max(10, transactions_amount//10)
+    if farms_amount == None:
+        farms_amount = max(1, transactions_amount//5000)
+    if chains_amount == None:
+        chains_amount = max(1, transactions_amount//10000)
+
+    hubs = [f"hub{index}" for index in range(hubs_amount)]
+    users = hubs + [f"user{index}" for index in range(users_amount - hubs_amount)]
+    weights = list(itertools.accumulate(1/(rank+1)**power for rank in range(len(users))))
+
+    farms = {}
+    for farm in range(farms_amount):
+        farms[f"master{farm}"] = [f"miner{farm}_{worker}" for worker in range(farm_size)]
+    one_way_chains = [[f"chain{chain}_{link}" for link in range(chain_length)]
+                      for chain in range(chains_amount)]
+
+    farm_amount = int(transactions_amount*farm_share)
+    chain_amount = int(transactions_amount*chain_share)
+    background_amount = transactions_amount - farm_amount - chain_amount
+
+    pairs = []
+    senders = rng.choices(users, cum_weights=weights, k=background_amount)
+    recipients = rng.choices(users, cum_weights=weights, k=background_amount)
+    for sender, recipient in zip(senders, recipients):
+        if sender == recipient:
+            recipient = users[rng.randrange(len(users))]
+        pairs.append((sender, recipient, round(rng.expovariate(1/5), 2)))
+
+    masters = list(farms)
+    for _ in range(farm_amount):
+        master = masters[rng.randrange(len(masters))]
+        workers = farms[master]
+        # workers are linked to network by faucet like hub payments
+        if rng.random() < 0.05:
+            pairs.append((hubs[rng.randrange(len(hubs))], workers[rng.randrange(len(workers))],
+                          round(rng.uniform(0.1, 1), 2)))
+        else:
+            pairs.append((workers[rng.randrange(len(workers))], master,
+                          round(rng.uniform(1, 20), 2)))
+
+    for index in range(chain_amount):
+        chain = one_way_chains[index % len(one_way_chains)]
+        link = rng.randrange(len(chain))
+        if link == 0:
+            # chains start with payment from network
+            pairs.append((users[rng.randrange(len(users))], chain[0], round(rng.uniform(10, 100), 2)))
+        else:
+            pairs.append((chain[link-1], chain[link], round(rng.uniform(10, 100), 2)))
+
+    rng.shuffle(pairs)
+    seconds = days*24*60*60
+    transactions = []
+    for sender, recipient, amount in pairs:
+        moment = start + datetime.timedelta(seconds=rng.randrange(seconds))
+        transactions.append({'hash':f"{rng.getrandbits(160):040x}",
+                             'amount':amount,
+                             'sender':sender,
+                             'recipient':recipient,
+                             'datetime':moment.strftime(DATETIME_FORMAT),
+                             'memo':'-'})
+    return SyntheticDataset(transactions, hubs, farms, one_way_chains, seed)
+
+
+class FakeServer:
+    '''
+    Local user_transactions API serving SyntheticDataset
+
+    with FakeServer(dataset) as server:
+        trace_transactions(username, api_url=server.api_url)
+    '''
+    def __init__(self,
+                 dataset:SyntheticDataset,
+                 delay:float = 0.0,
+                 error_rate:float = 0.0,
+                 throttle_rate:float = 0.0,
+                 retry_after:float = None,
+                 seed:int = 0):
+        '''
+        delay - seconds before every response
+        error_rate - share of requests answered with HTTP 500
+        throttle_rate - share of requests answered with HTTP 429
+        retry_after - Retry-After of 429 responses
+        '''
+        self.dataset = dataset
+        self.delay = delay
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.requests_amount = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._bodies = {} # username:encoded response
+        self._server = None
+        self._thread = None
+        self.api_url = None
+
+    def _get_body(self, username:str) -> bytes:
+        body = self._bodies.get(username)
+        if body == None:
+            body = json.dumps({'success':True,
+                               'result':self.dataset.by_user().get(username, [])}).encode('utf-8')
+            self._bodies[username] = body
+        return body
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests_amount += 1
+                    chance = server._rng.random()
+                if server.delay > 0:
+                    time.sleep(server.delay)
+                if chance < server.error_rate:
+                    self._send(500, b'')
+                elif chance < server.error_rate + server.throttle_rate:
+                    headers = {}
+                    if server.retry_after != None:
+                        headers['Retry-After'] = str(server.retry_after)
+                    self._send(429, b'', headers)
+                else:
+                    username = self.path.rsplit('/', 1)[-1]
+                    self._send(200, server._get_body(username))
+
+            def _send(self, status_code:int, body:bytes, headers = {}):
+                self.send_response(status_code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> str:
+        '''returns api_url'''
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='fake user_transactions server',
+                                        daemon=True)
+        self._thread.start()
+        self.api_url = f"http://127.0.0.1:{self._server.server_port}/user_transactions/"
+        return self.api_url
+
+    def stop(self):
+        if self._server != None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
@@ -0,0 +1,21 @@
+import os
+import sys
+import pytest
+
+# modules of the kit are imported by name from repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fetch_policy
+import synthetic
+import transactions_chain
+
+
+@pytest.fixture
+def server(dataset, monkeypatch):
+    '''FakeServer of dataset fixture of the test module'''
+    # live API limits would make every test slow
+    monkeypatch.setattr(transactions_chain, 'RATE_LIMITER', fetch_policy.RateLimiter(rate=10**9))
+    monkeypatch.setattr(transactions_chain, 'RETRY_POLICY',
+                        fetch_policy.RetryPolicy(base_delay=0.001, max_delay=0.01))
+    with synthetic.FakeServer(dataset) as server:
+        yield server
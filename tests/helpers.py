@@ -0,0 +1,37 @@
+import random
+import transactions_chain
+
+
+def create_chain(rows:list, columnar = False, sort = True,
+                 keep_graph = False) -> transactions_chain.TrasnsactionsChain:
+    '''
+    rows - list[sender, recipient, datetime] or list[sender, recipient, datetime, amount],
+        amount is 1.0 by default, hash of transaction is its index
+    root username is the first sender
+    '''
+    return transactions_chain.TrasnsactionsChain(rows[0][0], create_transactions(rows),
+                                                 sort, columnar, keep_graph)
+
+def create_transactions(rows:list, first_index = 0) -> list:
+    '''rows - as in create_chain'''
+    transactions = []
+    for index, row in enumerate(rows, first_index):
+        amount = 1.0
+        if len(row) > 3:
+            amount = float(row[3])
+        transactions.append(transactions_chain.Transaction.from_row(
+            (str(index), row[0], row[1], amount, row[2])))
+    return transactions
+
+def create_random_rows(rng:random.Random, max_users = 8, max_transactions = 60,
+                       max_datetime = 60, max_amount = 1) -> list:
+    '''returns at least one random row of create_chain between at least 2 users'''
+    usernames = [f"user{index}" for index in range(rng.randint(2, max_users))]
+    return [(rng.choice(usernames), rng.choice(usernames),
+             rng.randrange(max_datetime), rng.randint(1, max_amount))
+            for _ in range(rng.randint(1, max_transactions))]
+
+def create_random_chain(rng:random.Random, columnar = False, sort = True, keep_graph = False,
+                        **kwargs) -> transactions_chain.TrasnsactionsChain:
+    '''kwargs - limits of create_random_rows'''
+    return create_chain(create_random_rows(rng, **kwargs), columnar, sort, keep_graph)
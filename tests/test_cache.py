@@ -0,0 +1,83 @@
+import types
+import pytest
+import synthetic
+import transactions_cache
+import transactions_chain
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return synthetic.generate(1500, seed=4, users_amount=200)
+
+@pytest.fixture
+def clock(monkeypatch):
+    '''list with current time of transactions_cache'''
+    now = [1000.0]
+    monkeypatch.setattr(transactions_cache, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = transactions_cache.TransactionsCache(str(tmp_path/'cache.sqlite'))
+    yield cache
+    cache.close()
+
+def get_rows(transactions) -> list:
+    return sorted(transaction.to_row() for transaction in transactions)
+
+def get_cached_usernames(cache) -> list:
+    return sorted(row[0] for row in cache._connection.execute('SELECT username FROM transactions'))
+
+
+@pytest.mark.parametrize('use_threads, use_asyncio', [(False, False), (True, False), (False, True)])
+def test_warm_crawl_makes_no_requests(dataset, server, cache, use_threads, use_asyncio):
+    seed = dataset.masters[0]
+    chain = transactions_chain.trace_transactions(seed, use_threads=use_threads, use_asyncio=use_asyncio,
+                                                  api_url=server.api_url, cache=cache)
+    requests_amount = server.requests_amount
+    assert requests_amount > 0
+    warm_chain = transactions_chain.trace_transactions(seed, use_threads=use_threads, use_asyncio=use_asyncio,
+                                                       api_url=server.api_url, cache=cache)
+    assert server.requests_amount == requests_amount
+    assert get_rows(warm_chain.transactions) == get_rows(chain.transactions)
+
+def test_expired_user_is_refetched_and_merged(dataset, server, cache, clock):
+    cache.ttl = 100
+    username = dataset.hubs[0]
+    rows = get_rows(transactions_chain.get_transactions(username, api_url=server.api_url))
+    rows.sort(key=lambda row: row[4])
+    cache.store(username, rows[:len(rows)//2])
+    requests_amount = server.requests_amount
+
+    clock[0] += 50
+    fresh = transactions_chain.get_transactions(username, api_url=server.api_url, cache=cache)
+    assert get_rows(fresh) == sorted(rows[:len(rows)//2])
+    assert server.requests_amount == requests_amount
+
+    clock[0] += 100
+    assert cache.get(username) == None
+    refetched = transactions_chain.get_transactions(username, api_url=server.api_url, cache=cache)
+    assert server.requests_amount == requests_amount + 1
+    assert get_rows(refetched) == sorted(rows)
+    assert sorted(cache.get(username)) == sorted(rows)
+
+def test_only_rows_not_older_than_cached_are_merged(cache, clock):
+    cache.store('user', [('a', 'user', 'other', 1.0, 10), ('b', 'other', 'user', 1.0, 20)])
+    cache.store('user', [('a', 'user', 'other', 1.0, 10), ('c', 'user', 'other', 1.0, 15),
+                         ('d', 'user', 'other', 1.0, 20), ('e', 'other', 'user', 1.0, 30)])
+    assert [row[0] for row in cache.get('user')] == ['a', 'b', 'd', 'e']
+
+def test_least_recently_used_users_are_evicted(cache, clock):
+    cache.max_users = 3
+    for username in ('first', 'second', 'third'):
+        clock[0] += 1
+        cache.store(username, [(username, username, 'other', 1.0, 10)])
+    clock[0] += 1
+    assert cache.get('first') != None
+    clock[0] += 1
+    cache.store('fourth', [('fourth', 'fourth', 'other', 1.0, 10)])
+    assert cache.get('second', ignore_ttl=True) == None
+    assert get_cached_usernames(cache) == ['first', 'fourth', 'third']
+    clock[0] += 1
+    cache.store('fifth', [('fifth', 'fifth', 'other', 1.0, 10)])
+    assert get_cached_usernames(cache) == ['fifth', 'first', 'fourth']
@@ -0,0 +1,89 @@
+import pytest
+import synthetic
+import transactions_chain
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return synthetic.generate(2000, seed=7, users_amount=300)
+
+def get_connected_hashes(dataset, username:str) -> set:
+    '''hashes of all transactions reachable from username, found without API'''
+    by_user = dataset.by_user()
+    hashes = set()
+    seen = {username}
+    queue = [username]
+    while len(queue) > 0:
+        for transaction in by_user.get(queue.pop(), []):
+            hashes.add(transaction['hash'])
+            for other in (transaction['sender'], transaction['recipient']):
+                if other not in seen:
+                    seen.add(other)
+                    queue.append(other)
+    return hashes
+
+def get_hashes(chain) -> set:
+    return {transaction.hash for transaction in chain.transactions}
+
+
+@pytest.mark.parametrize('use_threads, use_asyncio', [(False, False), (True, False), (False, True)])
+def test_crawl_finds_connected_transactions(dataset, server, use_threads, use_asyncio):
+    seed = dataset.masters[0]
+    chain = transactions_chain.trace_transactions(seed, use_threads=use_threads, use_asyncio=use_asyncio,
+                                                  api_url=server.api_url)
+    assert get_hashes(chain) == get_connected_hashes(dataset, seed)
+    assert len(chain.transactions) == len(get_hashes(chain))
+
+@pytest.mark.parametrize('use_asyncio', [False, True])
+def test_checkpoint_has_every_transaction_once(dataset, server, tmp_path, use_asyncio):
+    path = str(tmp_path/'crawl.checkpoint')
+    chain = transactions_chain.trace_transactions(dataset.masters[0], use_asyncio=use_asyncio,
+                                                  api_url=server.api_url, checkpoint_path=path)
+    with open(path, 'r', encoding='utf-8') as file:
+        hashes = [line.split('\t')[1] for line in file if line.startswith('t\t')]
+    assert len(hashes) == len(set(hashes))
+    assert set(hashes) == get_hashes(chain)
+
+@pytest.mark.parametrize('use_asyncio', [False, True])
+def test_resumed_crawl_is_same_as_full_crawl(dataset, server, tmp_path, use_asyncio):
+    seed = dataset.masters[0]
+    path = str(tmp_path/'crawl.checkpoint')
+    partial_chain = transactions_chain.trace_transactions(seed, use_asyncio=use_asyncio, max_users=5,
+                                                          api_url=server.api_url, checkpoint_path=path)
+    expected = get_connected_hashes(dataset, seed)
+    assert len(get_hashes(partial_chain)) < len(expected)
+    chain = transactions_chain.trace_transactions(seed, use_asyncio=use_asyncio, api_url=server.api_url,
+                                                  checkpoint_path=path, resume=True)
+    assert get_hashes(chain) == expected
+    assert len(chain.transactions) == len(expected)
+
+@pytest.mark.parametrize('max_depth, max_degree', [(None, None), (1, None), (2, 15), (None, 25)])
+def test_traced_chain_is_same_as_limited_crawl(dataset, server, max_depth, max_degree):
+    white_list = [dataset.hubs[1]]
+    full_chain = transactions_chain.trace_transactions(dataset.masters[0], white_list, use_asyncio=True,
+                                                       api_url=server.api_url)
+    for seed in (dataset.masters[0], dataset.hubs[0], dataset.usernames()[50], dataset.usernames()[120]):
+        chain = transactions_chain.trace_transactions(seed, white_list, use_asyncio=True,
+                                                      api_url=server.api_url,
+                                                      max_depth=max_depth, max_degree=max_degree)
+        traced_chain = full_chain.get_traced_chain(seed, white_list, max_depth, max_degree)
+        assert get_hashes(traced_chain) == get_hashes(chain)
+
+def test_investigate_is_same_as_separate_traces(dataset, server):
+    seeds = [dataset.masters[0], dataset.hubs[0]]
+    results = transactions_chain.investigate(seeds, api_url=server.api_url, processes=2,
+                                             max_depth=2, max_degree=30)
+    for seed in seeds:
+        chain = transactions_chain.trace_transactions(seed, use_asyncio=True, api_url=server.api_url,
+                                                      max_depth=2, max_degree=30)
+        assert results[seed] == transactions_chain.detect_suspicious_accounts(seed, transactions=chain)
+    assert transactions_chain.investigate([], api_url=server.api_url) == {}
+
+@pytest.mark.parametrize('max_bunch', [1, 10, -1])
+def test_threads_expand_every_user_by_own_transactions(dataset, server, max_bunch):
+    seed = dataset.hubs[0]
+    chain = transactions_chain.trace_transactions(seed, max_bunch=max_bunch, api_url=server.api_url,
+                                                  max_depth=2, max_degree=20)
+    expected = transactions_chain.trace_transactions(seed, use_asyncio=True, api_url=server.api_url,
+                                                     max_depth=2, max_degree=20)
+    assert get_hashes(chain) == get_hashes(expected)
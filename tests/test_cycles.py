@@ -0,0 +1,50 @@
+import random
+import pytest
+import cycles
+from helpers import create_chain, create_random_chain
+
+
+def brute_force_cycles(chain, window:int, max_length:int, min_length:int) -> list:
+    '''returns sorted hashes of all cycles found by plain depth first search'''
+    found = []
+    def search(first, path:list, on_path:set):
+        last = path[-1]
+        for transaction in chain.search_transactions_by_sender(last.recipient, last.datetime+1,
+                                                               first.datetime+window):
+            if transaction.recipient == first.sender:
+                if len(path) + 1 >= min_length:
+                    found.append(tuple(element.hash for element in path + [transaction]))
+            elif transaction.recipient not in on_path and len(path) + 1 < max_length:
+                search(first, path + [transaction], on_path | {transaction.recipient})
+    for first in chain.transactions:
+        if first.sender != first.recipient:
+            search(first, [first], {first.sender, first.recipient})
+    return sorted(found)
+
+def get_hashes(cycles_found) -> list:
+    return sorted(tuple(transaction.hash for transaction in cycle) for cycle in cycles_found)
+
+
+def test_cycle_longer_than_shortcut_to_root():
+    # A->X->R is too short, but R->A->Y->X->R has to be found
+    chain = create_chain([('R', 'A', 1), ('A', 'X', 2), ('A', 'Y', 3), ('Y', 'X', 4), ('X', 'R', 5)])
+    assert get_hashes(cycles.find_cycles(chain, 100, 5, 4)) == [('0', '2', '3', '4')]
+
+def test_transactions_have_to_go_forward_in_time():
+    chain = create_chain([('A', 'B', 1), ('B', 'A', 1), ('B', 'C', 2), ('C', 'A', 2), ('C', 'A', 3)])
+    assert get_hashes(cycles.find_cycles(chain, 100)) == [('0', '2', '4')]
+
+def test_window():
+    chain = create_chain([('A', 'B', 0), ('B', 'A', 10)])
+    assert get_hashes(cycles.find_cycles(chain, 9)) == []
+    assert get_hashes(cycles.find_cycles(chain, 10)) == [('0', '1')]
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('min_length, max_length', [(2, 3), (2, 5), (3, 4), (4, 5), (5, 6)])
+def test_random_chains_against_brute_force(columnar, min_length, max_length):
+    rng = random.Random(min_length*10 + max_length)
+    for _ in range(60):
+        chain = create_random_chain(rng, columnar)
+        window = rng.randint(5, 60)
+        assert get_hashes(cycles.find_cycles(chain, window, max_length, min_length)) \
+            == brute_force_cycles(chain, window, max_length, min_length)
@@ -0,0 +1,149 @@
+import sys
+import random
+import pytest
+import synthetic
+import transactions_chain
+from helpers import create_random_chain
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return synthetic.generate(5000, seed=9, farms_amount=2)
+
+
+def test_main_account_without_numpy(dataset, monkeypatch):
+    chain = dataset.to_chain()
+    expected = transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain)
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    monkeypatch.delitem(sys.modules, 'centrality', raising=False)
+    monkeypatch.delitem(sys.modules, 'aggregation', raising=False)
+    assert transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain) == expected
+    with pytest.raises(ImportError, match='needs numpy'):
+        transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain,
+                                                      ranking='pagerank')
+
+def test_default_ranking_does_not_depend_on_numpy(dataset):
+    pytest.importorskip('numpy')
+    chain = dataset.to_chain()
+    assert transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain) \
+        == transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain,
+                                                         ranking='count')
+
+
+def baseline_one_way_senders(chain, recipient:str) -> list:
+    '''search_one_way_senders before per-account features'''
+    processed_senders = {} # username:True
+    to_return = []
+    for transaction in chain.search_transactions_by_recipient(recipient):
+        if transaction.get_sender() in processed_senders:
+            continue
+        processed_senders[transaction.get_sender()] = True
+
+        only_one_recipient = 1
+        only_sending = 1
+        same_recipient_sender = 1
+        recieved_by_sender_transactions = chain.search_transactions_by_recipient(transaction.get_sender())
+        if len(recieved_by_sender_transactions) > 0:
+            only_sending = 0
+        count_fails = 1
+        count_passes = 1
+        for recieved_transaction in recieved_by_sender_transactions:
+            if recieved_transaction.get_sender() == recipient:
+                count_fails += 1
+            else:
+                count_passes += 1
+        if count_fails >= count_passes:
+            same_recipient_sender = 1
+        count_fails = 1
+        count_passes = 1
+        for sent_transaction in chain.search_transactions_by_sender(transaction.get_sender()):
+            if sent_transaction.get_recipient() != recipient:
+                count_passes += 1
+            else:
+                count_fails += 1
+        if count_fails >= count_passes:
+            only_one_recipient = 1
+
+        if only_one_recipient + only_sending + same_recipient_sender >= 2:
+            to_return.append(transaction.get_sender())
+    return to_return
+
+def baseline_one_way_recipients(chain, sender:str) -> list:
+    '''search_one_way_recipients before per-account features'''
+    processed_recipients = {} # username:True
+    to_return = []
+    for transaction in chain.search_transactions_by_sender(sender):
+        if transaction.get_recipient() in processed_recipients:
+            continue
+        processed_recipients[transaction.get_recipient()] = True
+
+        only_one_recipient = 1
+        only_recieving = 1
+        same_recipient_sender = 1
+        if len(chain.search_transactions_by_sender(transaction.get_recipient())) > 0:
+            only_recieving = 0
+        count_fails = 1
+        count_passes = 1
+        for recieved_transaction in chain.search_transactions_by_recipient(transaction.get_recipient()):
+            if recieved_transaction.get_sender() == sender:
+                count_fails += 1
+            else:
+                count_passes += 1
+        if count_fails >= count_passes:
+            same_recipient_sender = 1
+        count_fails = 1
+        count_passes = 1
+        for sent_transaction in chain.search_transactions_by_sender(transaction.get_sender()):
+            if sent_transaction.get_recipient() != sender:
+                count_passes += 1
+            else:
+                count_fails += 1
+        if count_fails >= count_passes:
+            only_one_recipient = 1
+
+        if only_one_recipient + only_recieving + same_recipient_sender >= 2:
+            to_return.append(transaction.get_recipient())
+    return to_return
+
+def baseline_suspicious_accounts(chain, username:str, white_list=[]) -> list:
+    '''suspicious accounts of detect_suspicious_accounts before per-account features'''
+    sus_usernames = {username:True}
+    def add(sus_accounts:list):
+        for sus in sus_accounts:
+            if sus not in sus_usernames and sus not in white_list:
+                sus_usernames[sus] = True
+    # both searches of the root account look at root_username of chain
+    add(baseline_one_way_senders(chain, chain.root_username))
+    add(baseline_one_way_recipients(chain, chain.root_username))
+    processed_usernames = {username:True}
+    for transaction in chain:
+        if transaction.get_sender() not in processed_usernames:
+            add(baseline_one_way_senders(chain, transaction.get_sender()))
+            add(baseline_one_way_recipients(chain, transaction.get_sender()))
+            processed_usernames[transaction.get_sender()] = True
+        if transaction.get_recipient() not in processed_usernames:
+            add(baseline_one_way_senders(chain, transaction.get_recipient()))
+            processed_usernames[transaction.get_recipient()] = True
+    return list(sus_usernames)
+
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_suspicious_accounts_are_same_as_baseline(columnar):
+    rng = random.Random(11)
+    for _ in range(200):
+        chain = create_random_chain(rng, columnar, max_users=12, max_transactions=80,
+                                    max_datetime=1000, max_amount=5)
+        usernames = sorted(chain.get_nodes())
+        username = rng.choice(usernames)
+        white_list = rng.sample(usernames, rng.randint(0, 2))
+        sus_accounts, main_accounts = transactions_chain.detect_suspicious_accounts(
+            username, white_list, transactions=chain, ranking='count')
+        assert sus_accounts == baseline_suspicious_accounts(chain, username, white_list)
+        assert main_accounts == transactions_chain.determine_main_account(chain, sus_accounts, 'count')
+
+def test_synthetic_suspicious_accounts_are_same_as_baseline(dataset):
+    chain = dataset.to_chain()
+    for username in dataset.masters:
+        sus_accounts, _ = transactions_chain.detect_suspicious_accounts(username, transactions=chain,
+                                                                        ranking='count')
+        assert sus_accounts == baseline_suspicious_accounts(chain, username)
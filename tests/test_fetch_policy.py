@@ -0,0 +1,49 @@
+import pytest
+import fetch_policy
+import synthetic
+import transactions_chain
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return synthetic.generate(500, seed=11)
+
+def get_fast_policy(max_attempts = 10) -> fetch_policy.RetryPolicy:
+    return fetch_policy.RetryPolicy(max_attempts, base_delay=0.001, max_delay=0.01, timeout=5.0)
+
+
+def test_delay_is_limited_for_any_attempt():
+    policy = fetch_policy.RetryPolicy(max_attempts=None, base_delay=0.5, max_delay=60.0)
+    for attempt in (0, 10, 1100, 10**6):
+        assert 0 <= policy.get_delay(attempt) <= 60.0
+    assert policy.get_delay(0, retry_after=5.0) == 5.0
+    assert policy.get_delay(0, retry_after=500.0) == 60.0
+    assert policy.can_retry(10**9)
+
+def test_parse_retry_after():
+    assert fetch_policy.parse_retry_after(None) == None
+    assert fetch_policy.parse_retry_after('3') == 3.0
+    assert fetch_policy.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == None
+
+@pytest.mark.parametrize('error_rate, throttle_rate', [(0.3, 0.0), (0.0, 0.3), (0.2, 0.2)])
+def test_failed_requests_are_retried(dataset, error_rate, throttle_rate):
+    rate_limiter = fetch_policy.RateLimiter(rate=10**9)
+    with synthetic.FakeServer(dataset, error_rate=error_rate, throttle_rate=throttle_rate,
+                              retry_after=0, seed=3) as server:
+        for username in dataset.usernames()[:20]:
+            transactions = transactions_chain.get_transactions(username, api_url=server.api_url,
+                                                               retry_policy=get_fast_policy(50),
+                                                               rate_limiter=rate_limiter)
+            assert sorted(transaction.hash for transaction in transactions) \
+                == sorted(transaction['hash'] for transaction in dataset.by_user()[username])
+        assert server.requests_amount > 20
+
+def test_fetch_error_after_last_attempt(dataset):
+    with synthetic.FakeServer(dataset, error_rate=1.0) as server:
+        with pytest.raises(fetch_policy.FetchError) as error:
+            transactions_chain.get_transactions(dataset.masters[0], api_url=server.api_url,
+                                                retry_policy=get_fast_policy(3),
+                                                rate_limiter=fetch_policy.RateLimiter(rate=10**9))
+        assert error.value.attempts == 3
+        assert error.value.status_code == 500
+        assert server.requests_amount == 3
@@ -0,0 +1,99 @@
+import random
+import pytest
+import flow
+from helpers import create_chain, create_random_chain
+
+
+ATTRIBUTIONS = ['proportional', 'fifo']
+
+def test_fifo_spends_clean_balance_first():
+    # X holds 10 clean before tainted 10 arrives, then sends 10
+    chain = create_chain([('C', 'X', 1, 10), ('S', 'X', 2, 10), ('X', 'Y', 3, 10)])
+    trace = flow.trace_flow(chain, 'S', attribution='fifo')
+    assert trace.reached == {'X':10.0}
+    assert trace.held == {'X':10.0}
+    assert 'Y' in trace
+    trace = flow.trace_flow(chain, 'S', attribution='proportional')
+    assert trace.reached == {'X':10.0, 'Y':5.0}
+    assert trace.held == pytest.approx({'X':5.0, 'Y':5.0})
+
+def test_fifo_spends_lots_in_order():
+    chain = create_chain([('S', 'X', 1, 4), ('C', 'X', 2, 6), ('S', 'X', 3, 10),
+                          ('X', 'Y', 4, 8), ('X', 'Z', 5, 8)])
+    trace = flow.trace_flow(chain, 'S', attribution='fifo')
+    # Y gets 4 tainted and 4 of clean lot, Z gets 2 clean and 6 of the second tainted lot
+    assert trace.reached == pytest.approx({'X':14.0, 'Y':4.0, 'Z':6.0})
+    assert trace.held == pytest.approx({'X':4.0, 'Y':4.0, 'Z':6.0})
+    assert trace.edges['S'] == {'X':14.0}
+    assert trace.edges['X'] == pytest.approx({'Y':4.0, 'Z':6.0})
+
+@pytest.mark.parametrize('attribution', ATTRIBUTIONS)
+def test_money_recieved_in_the_same_second_is_not_sent(attribution):
+    chain = create_chain([('S', 'A', 1, 10), ('A', 'B', 1, 10), ('A', 'C', 2, 10)])
+    trace = flow.trace_flow(chain, 'S', attribution=attribution)
+    assert 'B' not in trace
+    assert trace.reached == {'A':10.0, 'C':10.0}
+    assert trace.first_reached == {'A':1, 'C':2}
+    assert trace.hops == {'S':0, 'A':1, 'C':2}
+
+@pytest.mark.parametrize('attribution', ATTRIBUTIONS)
+def test_source_amount(attribution):
+    chain = create_chain([('S', 'A', 1, 10), ('S', 'B', 2, 10), ('B', 'S', 3, 4)])
+    trace = flow.trace_flow(chain, 'S', attribution=attribution)
+    assert trace.sent == 20.0
+    assert trace.reached == {'A':10.0, 'B':10.0, 'S':4.0}
+    # money coming back to source without amount is not held
+    assert trace.held == {'A':10.0, 'B':6.0}
+
+    trace = flow.trace_flow(chain, 'S', amount=5, attribution=attribution)
+    assert trace.sent == 5.0
+    assert trace.reached == {'A':5.0}
+    assert trace.held == {'A':5.0}
+
+    trace = flow.trace_flow(chain, 'S', amount=30, attribution=attribution)
+    assert trace.sent == 20.0
+    assert trace.reached == {'A':10.0, 'B':10.0, 'S':4.0}
+    assert trace.held == {'A':10.0, 'B':6.0, 'S':14.0}
+
+@pytest.mark.parametrize('attribution', ATTRIBUTIONS)
+def test_start_and_end(attribution):
+    chain = create_chain([('S', 'A', 1), ('A', 'B', 5), ('B', 'C', 10), ('S', 'D', 12)])
+    assert sorted(flow.trace_flow(chain, 'S', attribution=attribution).reached) == ['A', 'B', 'C', 'D']
+    assert sorted(flow.trace_flow(chain, 'S', end=7, attribution=attribution).reached) == ['A', 'B']
+    assert sorted(flow.trace_flow(chain, 'S', start=2, attribution=attribution).reached) == ['D']
+    trace = flow.trace_flow(chain, 'S', start=1, end=10, attribution=attribution)
+    assert sorted(trace.reached) == ['A', 'B', 'C']
+    assert trace.first_reached == {'A':1, 'B':5, 'C':10}
+
+def test_small_parts_are_dropped():
+    chain = create_chain([('C', 'X', 1, 1000), ('S', 'X', 2, 1e-6), ('X', 'Y', 3, 1)])
+    trace = flow.trace_flow(chain, 'S')
+    assert 'Y' in trace and 'Y' not in trace.reached
+    trace = flow.trace_flow(chain, 'S', min_amount=0)
+    assert trace.reached['Y'] == pytest.approx(1e-9)
+
+def test_unknown_attribution_and_unsorted_chain():
+    chain = create_chain([('S', 'A', 1)])
+    with pytest.raises(ValueError):
+        flow.trace_flow(chain, 'S', attribution='lifo')
+    with pytest.raises(ValueError):
+        flow.trace_flow(create_chain([('S', 'A', 1)], sort=False), 'S')
+
+@pytest.mark.parametrize('attribution', ATTRIBUTIONS)
+@pytest.mark.parametrize('amount', [None, 3.0, 50.0])
+def test_tainted_amount_is_conserved(attribution, amount):
+    rng = random.Random(24)
+    for _ in range(200):
+        chain = create_random_chain(rng, max_users=6, max_transactions=40, max_datetime=20, max_amount=5)
+        source = chain.root_username
+        trace = flow.trace_flow(chain, source, amount=amount, attribution=attribution, min_amount=0)
+        held = sum(trace.held.values())
+        if amount == None:
+            assert held + trace.reached.get(source, 0.0) == pytest.approx(trace.sent)
+        else:
+            # money coming back to source is held and can be sent again
+            assert held == pytest.approx(amount)
+        for recipient, tainted in trace.reached.items():
+            assert tainted == pytest.approx(sum(recipients.get(recipient, 0.0)
+                                                for recipients in trace.edges.values()))
+        assert set(trace.reached) <= set(trace.first_reached) | {source}
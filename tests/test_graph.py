@@ -0,0 +1,141 @@
+import random
+import pytest
+import Graph
+
+
+def create_random_graph(rng:random.Random) -> Graph.Graph:
+    graph = Graph.Graph([])
+    for index in range(rng.randint(1, 8)):
+        graph.add_node(f"user{index}")
+    for _ in range(rng.randint(0, 20)):
+        graph.add_edge(rng.randrange(len(graph.nodes)), rng.randrange(len(graph.nodes)),
+                       rng.randint(1, 5))
+    return graph
+
+def get_simple_routs(graph:Graph.Graph, start:int, end:int, get_neighbours) -> list:
+    '''returns all routs without repeated nodes as lists of indexes'''
+    routs = []
+    def search(rout:list):
+        if rout[-1] == end:
+            routs.append(rout)
+            return
+        for neighbour in get_neighbours(rout[-1]):
+            if neighbour not in rout:
+                search(rout + [neighbour])
+    search([start])
+    return routs
+
+def get_strength(graph:Graph.Graph, rout:list) -> int:
+    '''weight of the weakest connection, start alone is infinitely strong'''
+    return min((graph.get_weight(first, second) for first, second in zip(rout, rout[1:])),
+               default=float('inf'))
+
+def brute_force_strength(graph:Graph.Graph, start:int, end:int, max_hops = None) -> int:
+    '''returns strength of the strongest rout, 0 if there is none'''
+    strengths = [get_strength(graph, rout)
+                 for rout in get_simple_routs(graph, start, end, graph.get_neighbours)
+                 if max_hops == None or len(rout) - 1 <= max_hops]
+    return max(strengths, default=0)
+
+def get_reachable(graph:Graph.Graph, start:int, get_neighbours) -> set:
+    reached = {start}
+    stack = [start]
+    while len(stack) > 0:
+        for neighbour in get_neighbours(stack.pop()):
+            if neighbour not in reached:
+                reached.add(neighbour)
+                stack.append(neighbour)
+    return reached
+
+def brute_force_components(graph:Graph.Graph, strongly_connected:bool) -> list:
+    '''returns sorted list[sorted node names] of components'''
+    components = set()
+    for node in range(len(graph.nodes)):
+        if strongly_connected:
+            component = [other for other in get_reachable(graph, node, graph.get_reachable_neighbours)
+                         if node in get_reachable(graph, other, graph.get_reachable_neighbours)]
+        else:
+            component = get_reachable(graph, node, graph.get_neighbours)
+        components.add(tuple(sorted(graph.nodes[member] for member in component)))
+    return sorted(list(component) for component in components)
+
+
+@pytest.mark.parametrize('bidirectional', [True, False])
+def test_shortest_sending_rout_against_brute_force(bidirectional):
+    rng = random.Random(3)
+    for _ in range(300):
+        graph = create_random_graph(rng)
+        for start in range(len(graph.nodes)):
+            for end in range(len(graph.nodes)):
+                routs = get_simple_routs(graph, start, end, graph.get_reachable_neighbours)
+                rout = graph.find_shortest_sending_rout(graph.nodes[start], graph.nodes[end],
+                                                        bidirectional)
+                if len(routs) == 0:
+                    assert rout == []
+                    continue
+                assert len(rout) == min(len(element) for element in routs)
+                assert rout[0] == graph.nodes[start] and rout[-1] == graph.nodes[end]
+                for sender, recipient in zip(rout, rout[1:]):
+                    assert graph.get_connection(sender, recipient) & 1
+
+def test_shortest_sending_routs_against_brute_force():
+    rng = random.Random(4)
+    for _ in range(300):
+        graph = create_random_graph(rng)
+        start = rng.randrange(len(graph.nodes))
+        routs = graph.find_shortest_sending_routs(graph.nodes[start])
+        for end in range(len(graph.nodes)):
+            simple_routs = get_simple_routs(graph, start, end, graph.get_reachable_neighbours)
+            if len(simple_routs) == 0:
+                assert graph.nodes[end] not in routs
+            else:
+                assert len(routs[graph.nodes[end]]) == min(len(element) for element in simple_routs)
+
+@pytest.mark.parametrize('max_hops', [None, 1, 2, 3])
+def test_strongest_correlations_against_brute_force(max_hops):
+    rng = random.Random(5 if max_hops == None else max_hops)
+    for _ in range(300):
+        graph = create_random_graph(rng)
+        start = rng.randrange(len(graph.nodes))
+        ranking = dict(graph.rank_correlations(graph.nodes[start], max_hops=max_hops))
+        for end in range(len(graph.nodes)):
+            strength = brute_force_strength(graph, start, end, max_hops)
+            rout = graph.find_strongest_correlations(graph.nodes[start], graph.nodes[end], max_hops)
+            if strength == 0:
+                assert rout == []
+                assert graph.nodes[end] not in ranking
+                continue
+            assert rout[0] == graph.nodes[start] and rout[-1] == graph.nodes[end]
+            assert max_hops == None or len(rout) - 1 <= max_hops
+            assert get_strength(graph, [graph._get_index(node) for node in rout]) == strength
+            if end != start:
+                assert ranking[graph.nodes[end]] == strength
+
+@pytest.mark.parametrize('strongly_connected', [False, True])
+def test_clusters_against_brute_force(strongly_connected):
+    rng = random.Random(15)
+    for _ in range(300):
+        graph = create_random_graph(rng)
+        components = brute_force_components(graph, strongly_connected)
+        if strongly_connected:
+            found = graph.get_strongly_connected_components()
+        else:
+            found = graph.get_connected_components()
+        assert sorted(sorted(component) for component in found) == components
+
+        min_size = rng.randint(1, 3)
+        clusters = graph.get_clusters(strongly_connected, min_size)
+        assert sorted(sorted(cluster.members) for cluster in clusters) \
+            == [component for component in components if len(component) >= min_size]
+        sizes = [len(cluster) for cluster in clusters]
+        assert sizes == sorted(sizes, reverse=True)
+        for cluster in clusters:
+            members = set(cluster.members)
+            edges = [(sender, recipient) for sender in members for recipient in members
+                     if graph.get_connection(sender, recipient) & 1]
+            assert cluster.transactions_amount \
+                == sum(graph.outgoing[graph.nodes_lookup_table[sender]][graph.nodes_lookup_table[recipient]]
+                       for sender, recipient in edges)
+            assert cluster.edges_amount == len([edge for edge in edges if edge[0] != edge[1]])
+            if len(cluster) > 1:
+                assert cluster.density == cluster.edges_amount / (len(cluster)*(len(cluster)-1))
@@ -0,0 +1,76 @@
+import datetime
+import json
+import time
+import pytest
+import transactions_chain
+
+
+ITEMS = [{'hash':'a'*40, 'sender':'żółw "quoted"', 'recipient':'back\\slash',
+          'amount':12.5, 'datetime':'01/02/2023 10:20:30', 'memo':'{"not":"json"}'},
+         {'hash':'b'*40, 'sender':'🦊 fox', 'recipient':'żółw "quoted"',
+          'amount':1e-3, 'datetime':'28/02/2023 23:59:59', 'memo':'[],'},
+         {'hash':'c'*40, 'sender':'plain', 'recipient':'🦊 fox',
+          'amount':100, 'datetime':'01/03/2023 00:00:00', 'memo':''}]
+
+BODIES = [(json.dumps({'success':True, 'result':ITEMS, 'server':'main'}, ensure_ascii=False), ITEMS),
+          (json.dumps({'server':'main', 'result':ITEMS[:1]}, ensure_ascii=False, indent=2), ITEMS[:1]),
+          # numbers and literals outside of result can be cut by chunks
+          ('{"count":12345,"success":true,"result":' + json.dumps(ITEMS[1:]) + ',"total":6789}', ITEMS[1:]),
+          ('{"success":true,"result":[]}', []),
+          ('{"success":true,"result":"User not found"}', []),
+          ('{"success":false,"message":"Too many requests"}', []),
+          ('{}', []),
+          (' { } ', [])]
+
+def split(data:bytes, size:int) -> list:
+    return [data[index:index+size] for index in range(0, len(data), size)]
+
+def get_rows(transactions) -> list:
+    return [transaction.to_row() for transaction in transactions]
+
+
+@pytest.mark.parametrize('body, items', BODIES, ids=['items', 'indented', 'numbers', 'empty_result',
+                                                     'not_found', 'failure', 'empty', 'spaces'])
+def test_stream_is_parsed_at_every_chunk_size(body, items):
+    expected = get_rows(transactions_chain.Transaction(item['hash'], item) for item in items)
+    data = body.encode('utf-8')
+    for size in range(1, len(data) + 1):
+        chunks = transactions_chain._decode_chunks(split(data, size))
+        assert get_rows(transactions_chain.parse_transactions_stream(chunks)) == expected
+
+def test_broken_stream_raises():
+    with pytest.raises(ValueError):
+        list(transactions_chain.parse_transactions_stream(['{"result":[{"hash":']))
+    with pytest.raises(ValueError):
+        list(transactions_chain.parse_transactions_stream(['[]']))
+
+
+@pytest.fixture
+def timezone(monkeypatch):
+    '''sets TZ, memoized hours of other timezone are dropped before and after'''
+    if not hasattr(time, 'tzset'):
+        pytest.skip('time.tzset is not available')
+    def set_timezone(name:str):
+        monkeypatch.setenv('TZ', name)
+        time.tzset()
+        transactions_chain._parse_date_hour.cache_clear()
+    yield set_timezone
+    monkeypatch.undo()
+    time.tzset()
+    transactions_chain._parse_date_hour.cache_clear()
+
+# Lord Howe moves clocks by half an hour
+@pytest.mark.parametrize('name, start', [('Europe/Warsaw', datetime.datetime(2023, 3, 25)),
+                                         ('Europe/Warsaw', datetime.datetime(2023, 10, 28)),
+                                         ('America/New_York', datetime.datetime(2023, 3, 11)),
+                                         ('America/New_York', datetime.datetime(2023, 11, 4)),
+                                         ('Australia/Lord_Howe', datetime.datetime(2023, 4, 1)),
+                                         ('Australia/Lord_Howe', datetime.datetime(2023, 9, 30))])
+def test_parse_datetime_is_same_as_strptime(timezone, name, start):
+    timezone(name)
+    value = start
+    while value < start + datetime.timedelta(days=2):
+        text = value.strftime('%d/%m/%Y %H:%M:%S')
+        assert transactions_chain.parse_datetime(text) \
+            == int(datetime.datetime.strptime(text, '%d/%m/%Y %H:%M:%S').timestamp()), text
+        value += datetime.timedelta(minutes=1, seconds=7)
@@ -0,0 +1,86 @@
+import pytest
+import snapshot
+import synthetic
+import transactions_chain
+
+
+@pytest.fixture(scope='module')
+def chain():
+    chain = synthetic.generate(5000, seed=2).to_chain()
+    chain.create_graph()
+    return chain
+def get_rows(transactions) -> list:
+    return [transaction.to_row() for transaction in transactions]
+
+
+def test_snapshot_has_same_transactions(chain, tmp_path):
+    path = str(tmp_path/'chain.snapshot')
+    snapshot.save_snapshot(chain, path)
+    with snapshot.load_snapshot(path) as loaded:
+        assert [transaction.to_row() for transaction in loaded.transactions] \
+            == [transaction.to_row() for transaction in chain.transactions]
+        for columnar in (True, False):
+            loaded_chain = loaded.to_chain(columnar=columnar)
+            assert loaded_chain.search_transactions_by_user('hub0') == chain.search_transactions_by_user('hub0')
+
+@pytest.mark.parametrize('sort', [True, False])
+def test_mapped_chain_is_same_as_chain(sort, tmp_path):
+    dataset = synthetic.generate(3000, seed=6)
+    chain = dataset.to_chain(sort=sort)
+    path = str(tmp_path/'chain.snapshot')
+    snapshot.save_snapshot(chain, path)
+    with snapshot.load_snapshot(path) as loaded:
+        mapped_chain = loaded.to_chain(copy=False)
+        start = chain.transactions[len(chain.transactions)//3].datetime
+        for username in dataset.usernames()[:100] + ['missing']:
+            for search in ('search_transactions_by_sender',
+                           'search_transactions_by_recipient',
+                           'search_transactions_by_user'):
+                assert get_rows(getattr(mapped_chain, search)(username)) \
+                    == get_rows(getattr(chain, search)(username))
+                assert get_rows(getattr(mapped_chain, search)(username, start)) \
+                    == get_rows(getattr(chain, search)(username, start))
+        for transaction in chain.transactions[::31]:
+            assert mapped_chain[transaction.hash].to_row() == transaction.to_row()
+        assert mapped_chain['missing'] == None
+        assert transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=mapped_chain) \
+            == transactions_chain.detect_suspicious_accounts(dataset.masters[0], transactions=chain)
+        with pytest.raises(TypeError):
+            mapped_chain.extend_transactions(dataset.to_transactions()[:10] + [transactions_chain.Transaction.from_row(
+                ('new', 'hub0', 'hub1', 1.0, 0))])
+        del mapped_chain
+
+def test_sorted_snapshot_columns_need_no_sorting(chain, tmp_path):
+    path = str(tmp_path/'chain.snapshot')
+    snapshot.save_snapshot(chain, path)
+    with snapshot.load_snapshot(path) as loaded:
+        mapped_chain = transactions_chain.TrasnsactionsChain(loaded.root_username, loaded.transactions)
+        assert get_rows(mapped_chain.search_transactions_by_user('hub0')) \
+            == get_rows(chain.search_transactions_by_user('hub0'))
+        del mapped_chain
+
+def test_mapped_graph_is_same_as_graph(chain, tmp_path):
+    path = str(tmp_path/'chain.snapshot')
+    snapshot.save_snapshot(chain, path)
+    with snapshot.load_snapshot(path) as loaded:
+        graph = loaded.graph
+        for node in ('hub0', 'hub3', 'master0', 'user40'):
+            assert sorted(graph.get_neighbours(node)) == sorted(chain.graph.get_neighbours(node))
+            assert graph.rank_correlations(node, top=10) == chain.graph.rank_correlations(node, top=10)
+            assert graph.find_shortest_sending_rout(node, 'master0') \
+                == chain.graph.find_shortest_sending_rout(node, 'master0')
+        del graph
+
+def test_snapshot_keeps_any_hash(tmp_path):
+    transactions = synthetic.generate(300, seed=3).to_transactions()
+    for index, transaction_hash in enumerate(['AB'*20, 'short', '', '0'*40]):
+        transactions[index*20].hash = transaction_hash
+    chain = transactions_chain.TrasnsactionsChain('hub0', transactions, columnar=True)
+    path = str(tmp_path/'chain.snapshot')
+    snapshot.save_snapshot(chain, path)
+    with snapshot.load_snapshot(path) as loaded:
+        assert [transaction.to_row() for transaction in loaded.transactions] \
+            == [transaction.to_row() for transaction in chain.transactions]
+        loaded_chain = loaded.to_chain()
+        for transaction in transactions:
+            assert loaded_chain[transaction.hash].to_row() == transaction.to_row()
@@ -0,0 +1,184 @@
+import datetime
+import random
+import pytest
+import synthetic
+import transactions_chain
+from helpers import create_random_chain, create_random_rows, create_transactions
+
+
+def get_edges(graph) -> dict:
+    '''returns {(sender, recipient):transactions_amount} of graph by names'''
+    return {(graph.nodes[sender], graph.nodes[recipient]):amount
+            for sender in range(len(graph.nodes))
+            for recipient, amount in graph.outgoing[sender].items()}
+
+def get_incoming(graph, node:str) -> dict:
+    '''returns {sender:transactions_amount} of node by names'''
+    return {graph.nodes[sender]:amount
+            for sender, amount in graph.incoming[graph.nodes_lookup_table[node]].items()}
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    return synthetic.generate(3000, seed=5, days=30)
+
+def get_rows(transactions) -> list:
+    return [transaction.to_row() for transaction in transactions]
+
+
+@pytest.mark.parametrize('sort', [True, False])
+def test_columnar_chain_is_same_as_list_chain(dataset, sort):
+    chain = dataset.to_chain(sort=sort)
+    columnar_chain = dataset.to_chain(sort=sort, columnar=True)
+    assert get_rows(columnar_chain.transactions) == get_rows(chain.transactions)
+    start = chain.transactions[len(chain.transactions)//4].datetime
+    end = chain.transactions[len(chain.transactions)//2].datetime
+    for username in dataset.usernames()[:200]:
+        for search in ('search_transactions_by_sender',
+                       'search_transactions_by_recipient',
+                       'search_transactions_by_user'):
+            assert get_rows(getattr(columnar_chain, search)(username)) \
+                == get_rows(getattr(chain, search)(username))
+            assert get_rows(getattr(columnar_chain, search)(username, start, end)) \
+                == get_rows(getattr(chain, search)(username, start, end))
+    for transaction in chain.transactions[::97]:
+        assert columnar_chain[transaction.hash].to_row() == transaction.to_row()
+    assert columnar_chain['missing'] == None
+    features = chain.get_accounts_features()
+    columnar_features = columnar_chain.get_accounts_features()
+    assert features.keys() == columnar_features.keys()
+    for username, account in features.items():
+        assert columnar_features[username].senders == account.senders
+        assert columnar_features[username].recipients == account.recipients
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_appended_transactions_are_indexed(dataset, columnar):
+    transactions = dataset.to_transactions()
+    random.Random(1).shuffle(transactions)
+    chain = transactions_chain.TrasnsactionsChain(dataset.masters[0], transactions[:1000],
+                                                  columnar=columnar)
+    for transaction in transactions[1000:1100]:
+        chain.append_transaction(transaction)
+    chain.extend_transactions(transactions[1100:1120])
+    chain.extend_transactions(transactions[1000:])
+    expected = dataset.to_chain()
+    assert len(chain.transactions) == len(expected.transactions)
+    assert [row[4] for row in get_rows(chain.transactions)] \
+        == [row[4] for row in get_rows(expected.transactions)]
+    for username in dataset.usernames()[:200]:
+        assert sorted(get_rows(chain.search_transactions_by_user(username))) \
+            == sorted(get_rows(expected.search_transactions_by_user(username)))
+
+# hashes of API are 40 hex digits, others are kept as strings
+ODD_HASHES = ['AB'*20, 'ab'*19 + ' a', 'ab'*21, 'short', '', '0'*40]
+
+def test_columnar_chain_keeps_any_hash(dataset):
+    transactions = dataset.to_transactions()[:500]
+    for index, transaction_hash in enumerate(ODD_HASHES):
+        transactions[index*50].hash = transaction_hash
+    chain = transactions_chain.TrasnsactionsChain(dataset.masters[0], transactions, columnar=True)
+    assert sorted(get_rows(chain.transactions)) == sorted(get_rows(transactions))
+    for transaction in transactions:
+        assert chain[transaction.hash].to_row() == transaction.to_row()
+    assert chain['ab'*20] == None
+    assert chain.extend_transactions(transactions[::7]) == []
+
+def sorted_counterparties(counterparties:list) -> list:
+    '''ties of amounts are ordered differently, so [username, amount] pairs are compared sorted'''
+    return sorted((username, round(amount, 6)) for username, amount in counterparties)
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_aggregates_are_same_as_chain(columnar):
+    aggregation = pytest.importorskip('aggregation')
+    rng = random.Random(6)
+    for _ in range(100):
+        chain = create_random_chain(rng, columnar, max_users=10, max_amount=5)
+        aggregates = aggregation.aggregate(chain)
+        usernames = chain.get_nodes()
+        assert sorted(aggregates.get_suspicious_accounts()) \
+            == sorted(username for username in usernames if chain.is_suspicious(username))
+        top_senders = aggregates.top_senders(3)
+        top_recipients = aggregates.top_recipients(3)
+        for username in usernames + ['missing']:
+            assert aggregates.total_recieved(username) == pytest.approx(chain.total_recieved(username))
+            assert aggregates.total_sent(username) == pytest.approx(chain.total_sent(username))
+            assert sorted_counterparties(aggregates.get_top_senders(username, len(usernames))) \
+                == sorted_counterparties(chain.get_top_senders(username, len(usernames)))
+            assert sorted_counterparties(aggregates.get_top_recipients(username, len(usernames))) \
+                == sorted_counterparties(chain.get_top_recipients(username, len(usernames)))
+            assert [amount for _, amount in aggregates.get_top_senders(username, 3)] \
+                == [amount for _, amount in chain.get_top_senders(username, 3)]
+            assert top_senders.get(username, []) == aggregates.get_top_senders(username, 3)
+            assert top_recipients.get(username, []) == aggregates.get_top_recipients(username, 3)
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('sort', [True, False])
+def test_windowed_queries_are_same_as_filtered_chain(columnar, sort):
+    rng = random.Random(10)
+    for _ in range(100):
+        chain = create_random_chain(rng, columnar, sort, max_users=6, max_amount=5)
+        start = rng.choice([None, rng.randrange(60)])
+        end = rng.choice([None, rng.randrange(60)])
+        window = [transaction for transaction in chain.transactions
+                  if (start == None or transaction.datetime >= start)
+                  and (end == None or transaction.datetime <= end)]
+        assert sorted(get_rows(chain.search_transactions_by_time(start, end))) == sorted(get_rows(window))
+        if start != None:
+            assert get_rows(chain.search_transactions_by_time(datetime.datetime.fromtimestamp(start), end)) \
+                == get_rows(chain.search_transactions_by_time(start, end))
+        if len(window) == 0:
+            assert get_edges(chain.create_graph(start, end)) == {}
+            continue
+        filtered = transactions_chain.TrasnsactionsChain(chain.root_username, window, sort)
+        assert get_edges(chain.create_graph(start, end)) == get_edges(filtered.create_graph())
+        assert sorted(chain.get_nodes(start, end)) == sorted(filtered.get_nodes())
+        for username in chain.get_nodes():
+            assert chain.get_top_senders(username, 3, start, end) == filtered.get_top_senders(username, 3)
+            assert chain.get_top_recipients(username, 3, start, end) \
+                == filtered.get_top_recipients(username, 3)
+            assert chain.total_recieved(username, start, end) == filtered.total_recieved(username)
+            assert chain.total_sent(username, start, end) == filtered.total_sent(username)
+            assert get_rows(chain.search_transactions_by_user(username, start, end)) \
+                == get_rows(filtered.search_transactions_by_user(username))
+
+@pytest.mark.parametrize('columnar', [False, True])
+@pytest.mark.parametrize('sort', [True, False])
+def test_kept_graph_is_same_as_created_graph(columnar, sort):
+    rng = random.Random(13)
+    for _ in range(50):
+        transactions = create_transactions(create_random_rows(rng, max_transactions=200))
+        position = len(transactions)//4
+        chain = transactions_chain.TrasnsactionsChain(transactions[0].sender, transactions[:position],
+                                                      sort, columnar, keep_graph=True)
+        while position < len(transactions):
+            batch_size = rng.randint(1, 100)
+            # repeated transactions must not be counted twice
+            repeated = rng.sample(transactions[:position], min(position, 3))
+            if rng.random() < 0.5:
+                for transaction in transactions[position:position+batch_size] + repeated:
+                    chain.append_transaction(transaction)
+            else:
+                chain.extend_transactions(transactions[position:position+batch_size] + repeated)
+            position += batch_size
+        assert len(chain.transactions) == len(transactions)
+        kept_graph = chain.graph
+        assert get_edges(kept_graph) == get_edges(chain.create_graph())
+        assert sorted(kept_graph.nodes) == sorted(chain.graph.nodes)
+        for node in kept_graph.nodes:
+            assert kept_graph.nodes[kept_graph.nodes_lookup_table[node]] == node
+            assert get_incoming(kept_graph, node) == get_incoming(chain.graph, node)
+
+@pytest.mark.parametrize('columnar', [False, True])
+def test_cluster_volume_is_amount_sent_inside_cluster(columnar):
+    rng = random.Random(15)
+    for _ in range(50):
+        chain = create_random_chain(rng, columnar, max_users=12, max_transactions=30, max_amount=5)
+        for strongly_connected in (False, True):
+            clusters = chain.get_clusters(strongly_connected, min_size=1)
+            assert sorted(username for cluster in clusters for username in cluster.members) \
+                == sorted(chain.get_nodes())
+            for cluster in clusters:
+                members = set(cluster.members)
+                assert cluster.volume == sum(transaction.amount for transaction in chain.transactions
+                                             if transaction.sender in members
+                                             and transaction.recipient in members)
@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+import time
+
+
+class TransactionsCache:
+    '''
+    Persistent per-user cache of fetched transactions
+
+    rows are tuples (hash, sender, recipient, amount, datetime)
+    '''
+    def __init__(self, path:str = 'transactions_cache.sqlite',
+                 ttl:float = 24*60*60,
+                 max_users:int = 100000):
+        '''
+        ttl - seconds after which cached user is refetched
+        max_users - least recently used users above this amount are evicted
+        '''
+        self.path = path
+        self.ttl = ttl
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transactions (
+                username TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                amount REAL NOT NULL,
+                datetime INTEGER NOT NULL,
+                PRIMARY KEY (username, hash)
+            );
+            CREATE INDEX IF NOT EXISTS users_last_used ON users(last_used);
+        ''')
+        self._connection.commit()
+
+    def _select_rows(self, username:str) -> list:
+        return self._connection.execute(
+            'SELECT hash, sender, recipient, amount, datetime FROM transactions '
+            'WHERE username = ? ORDER BY datetime', (username,)).fetchall()
+
+    def get(self, username:str, ignore_ttl = False) -> list:
+        '''returns None if user is not cached or cache is expired'''
+        now = time.time()
+        with self._lock:
+            user = self._connection.execute(
+                'SELECT fetched_at FROM users WHERE username = ?',
+                (username,)).fetchone()
+            if user == None:
+                return None
+            if not ignore_ttl and user[0] + self.ttl < now:
+                return None
+            self._connection.execute(
+                'UPDATE users SET last_used = ? WHERE username = ?', (now, username))
+            self._connection.commit()
+            return self._select_rows(username)
+
+    def store(self, username:str, rows:list):
+        '''merges only rows not older than the newest cached one'''
+        now = time.time()
+        with self._lock:
+            newest = self._connection.execute(
+                'SELECT MAX(datetime) FROM transactions WHERE username = ?',
+                (username,)).fetchone()[0]
+            if newest != None:
+                rows = [row for row in rows if row[4] >= newest]
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?)',
+                [(username,) + tuple(row) for row in rows])
+            self._connection.execute(
+                'INSERT OR REPLACE INTO users VALUES (?, ?, ?)', (username, now, now))
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        users_amount = self._connection.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        if users_amount <= self.max_users:
+            return
+        evicted = self._connection.execute(
+            'SELECT username FROM users ORDER BY last_used LIMIT ?',
+            (users_amount - self.max_users,)).fetchall()
+        self._connection.executemany('DELETE FROM transactions WHERE username = ?', evicted)
+        self._connection.executemany('DELETE FROM users WHERE username = ?', evicted)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
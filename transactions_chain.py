@@ -1,9 +1,43 @@
 import requests
+from requests.adapters import HTTPAdapter
 import datetime
 import threading
+import asyncio
+import concurrent.futures
+import bisect
+import array
+import sys
+import json
+import codecs
+import functools
+import heapq
+import operator
+import collections
+import time
+import zlib
 import Graph
+import crawl_checkpoint
+import fetch_policy
+import instrumentation
+from math import inf as infinity
 
 
+API_URL = 'https://server.duinocoin.com/user_transactions/'
+
+STREAM_CHUNK_SIZE = 64*1024
+
+# bytes of binary transaction hash, API hashes are 40 hex digits
+HASH_SIZE = 20
+
+# sorted batches up to this size are inserted one by one,
+# moving list tail in C is faster than merging whole list in python
+INSERT_BATCH_SIZE = 64
+
+# used when no retry_policy or rate_limiter is passed,
+# the rate limiter is shared so all crawls back off together
+RETRY_POLICY = fetch_policy.RetryPolicy()
+RATE_LIMITER = fetch_policy.RateLimiter()
+
 STANDART_WHITE_LIST = ['coinexchange',
                        'NodeSBroker',
                        'NodeS',
@@ -12,14 +46,50 @@ STANDART_WHITE_LIST = ['coinexchange',
                        'revox',
                        'wDUCO']
 
-class Transaction:
-    def __init__(self,hash:str,raw_data:dict):
-        self.amount:float = raw_data['amount']
-        self.sender:str = raw_data['sender']
-        self.recipient:str = raw_data['recipient']
-        self.hash:str = hash
-        self.datetime:int = int(datetime.datetime.strptime(raw_data['datetime'],
-                                                        "%d/%m/%Y %H:%M:%S").timestamp())
+@functools.lru_cache(maxsize=4096)
+def _parse_date_hour(prefix:str) -> int:
+    '''
+    prefix - "%d/%m/%Y %H", timestamp of the start of that local hour,
+        None if utc offset changes inside the hour (half hour DST changes)
+    '''
+    start = datetime.datetime(int(prefix[6:10]),
+                              int(prefix[3:5]),
+                              int(prefix[0:2]),
+                              int(prefix[11:13]))
+    timestamp = int(start.timestamp())
+    if int(start.replace(minute=59, second=59).timestamp()) - timestamp != 59*60 + 59:
+        return None
+    return timestamp
+
+def parse_datetime(value:str) -> int:
+    '''
+    fast version of int(datetime.strptime(value, "%d/%m/%Y %H:%M:%S").timestamp())
+
+    timestamps of repeated date and hour prefixes are memoized
+    '''
+    if len(value) != 19:
+        return int(datetime.datetime.strptime(value,"%d/%m/%Y %H:%M:%S").timestamp())
+    hour_start = _parse_date_hour(value[:13])
+    if hour_start == None:
+        return int(datetime.datetime.strptime(value,"%d/%m/%Y %H:%M:%S").timestamp())
+    return hour_start + int(value[14:16])*60 + int(value[17:19])
+
+_get_datetime = operator.attrgetter('datetime')
+
+def _to_timestamp(value) -> int:
+    '''accepts timestamp, datetime.datetime or "%d/%m/%Y %H:%M:%S"'''
+    if isinstance(value, datetime.datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return parse_datetime(value)
+    return value
+
+class _TransactionBase:
+    '''methods shared by Transaction and TransactionView'''
+    __slots__ = ()
+
+    def to_row(self) -> tuple:
+        return (self.hash, self.sender, self.recipient, self.amount, self.datetime)
     def __str__(self):
         return f"[{self.datetime}]: {self.sender} -> {self.recipient} | {self.amount} | {self.hash}"
     def __repr__(self):
@@ -37,10 +107,300 @@ class Transaction:
         return self.sender
     def get_recipient(self):
         return self.recipient
-        
+
+class Transaction(_TransactionBase):
+    __slots__ = ('amount', 'sender', 'recipient', 'hash', 'datetime')
+
+    def __init__(self,hash:str,raw_data:dict):
+        self.amount:float = raw_data['amount']
+        self.sender:str = sys.intern(raw_data['sender'])
+        self.recipient:str = sys.intern(raw_data['recipient'])
+        self.hash:str = hash
+        self.datetime:int = parse_datetime(raw_data['datetime'])
+    @classmethod
+    def from_row(cls, row:tuple):
+        '''row - (hash, sender, recipient, amount, datetime)'''
+        transaction = cls.__new__(cls)
+        transaction.hash, transaction.sender, transaction.recipient,\
+            transaction.amount, transaction.datetime = row
+        return transaction
+
+class TransactionView(_TransactionBase):
+    '''lightweight read-only row of TransactionsColumns'''
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns, row:int):
+        self._columns = columns
+        self._row = row
+
+    @property
+    def amount(self) -> float:
+        return self._columns.amounts[self._row]
+    @property
+    def sender(self) -> str:
+        return self._columns.accounts[self._columns.senders[self._row]]
+    @property
+    def recipient(self) -> str:
+        return self._columns.accounts[self._columns.recipients[self._row]]
+    @property
+    def hash(self) -> str:
+        return self._columns.hashes[self._row]
+    @property
+    def datetime(self) -> int:
+        return self._columns.datetimes[self._row]
+
+class HashColumn:
+    '''
+    list-like column of transaction hashes
+
+    hashes of HASH_SIZE*2 lowercase hex digits, like hashes of API,
+        are kept as HASH_SIZE bytes in one bytearray,
+        other hashes are kept as strings in self.other
+    '''
+    def __init__(self, data = None, other = None):
+        if data == None:
+            data = bytearray()
+        if other == None:
+            other = {}
+        self.data = data
+        self.other = other # row:hash that is not hex
+
+    @staticmethod
+    def encode(transaction_hash:str):
+        '''returns key of hash, bytes for hex hashes and the hash itself for others'''
+        if len(transaction_hash) == HASH_SIZE*2:
+            try:
+                key = bytes.fromhex(transaction_hash)
+            except ValueError:
+                return transaction_hash
+            # fromhex skips whitespace and accepts upper case
+            if key.hex() == transaction_hash:
+                return key
+        return transaction_hash
+
+    def get_key(self, row:int):
+        '''returns key of hash of row without decoding it'''
+        if row in self.other:
+            return self.other[row]
+        start = row*HASH_SIZE
+        return self.data[start:start+HASH_SIZE]
+
+    def append(self, transaction_hash:str):
+        key = self.encode(transaction_hash)
+        if isinstance(key, str):
+            self.other[len(self)] = transaction_hash
+            key = bytes(HASH_SIZE)
+        self.data += key
+
+    def __len__(self) -> int:
+        return len(self.data) // HASH_SIZE
+
+    def __getitem__(self, row:int) -> str:
+        if row < 0:
+            row += len(self)
+        if row < 0 or row >= len(self):
+            raise IndexError('hash index out of range')
+        if row in self.other:
+            return self.other[row]
+        start = row*HASH_SIZE
+        return self.data[start:start+HASH_SIZE].hex()
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+class TransactionsColumns:
+    '''
+    Columnar list-like storage of transactions
+
+    rows are never moved, self.order keeps rows in list order,
+        so TransactionView stays valid after inserts
+    '''
+    def __init__(self, transactions=()):
+        self.accounts = [] # account_id:username
+        self.accounts_lookup_table = {} # username:account_id
+        self.senders = array.array('i')
+        self.recipients = array.array('i')
+        self.amounts = array.array('d')
+        self.datetimes = array.array('q')
+        self.hashes = HashColumn()
+        self.order = array.array('i')
+        for transaction in transactions:
+            self.append(transaction)
+
+    def _get_account_id(self, username:str) -> int:
+        account_id = self.accounts_lookup_table.get(username)
+        if account_id == None:
+            account_id = len(self.accounts)
+            self.accounts.append(sys.intern(username))
+            self.accounts_lookup_table[username] = account_id
+        return account_id
+
+    def _add_row(self, transaction) -> int:
+        self.senders.append(self._get_account_id(transaction.sender))
+        self.recipients.append(self._get_account_id(transaction.recipient))
+        self.amounts.append(transaction.amount)
+        self.datetimes.append(transaction.datetime)
+        self.hashes.append(transaction.hash)
+        return len(self.datetimes) - 1
+
+    def append(self, transaction):
+        self.order.append(self._add_row(transaction))
+
+    def extend(self, transactions) -> list:
+        '''returns views of added rows'''
+        first_row = len(self.datetimes)
+        for transaction in transactions:
+            self.append(transaction)
+        return [TransactionView(self,row) for row in range(first_row, len(self.datetimes))]
+
+    def merge(self, transactions:list) -> list:
+        '''
+        merges transactions sorted by datetime into rows sorted by datetime
+            in linear time, returns views of added rows
+        '''
+        first_row = len(self.datetimes)
+        for transaction in transactions:
+            self._add_row(transaction)
+        new_rows = range(first_row, len(self.datetimes))
+        self.order = array.array('i', heapq.merge(self.order, new_rows,
+                                                  key=self.datetimes.__getitem__))
+        return [TransactionView(self,row) for row in new_rows]
+
+    def insert(self, index:int, transaction):
+        self.order.insert(index, self._add_row(transaction))
+
+    def sort_by_datetime(self):
+        '''stable sort of rows by datetime without creating views'''
+        self.order = array.array('i', sorted(self.order, key=self.datetimes.__getitem__))
+
+    def sort(self, key=None, reverse=False):
+        if key == None:
+            def key(element):
+                return element
+        rows = sorted(self.order,
+                      key=lambda row: key(TransactionView(self,row)),
+                      reverse=reverse)
+        self.order = array.array('i', rows)
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index,slice):
+            return [TransactionView(self,row) for row in self.order[index]]
+        return TransactionView(self,self.order[index])
+
+    def __iter__(self):
+        for row in self.order:
+            yield TransactionView(self,row)
+
+def _hash_key(key) -> int:
+    '''hash of HashColumn key, unlike hash() it is the same in every process'''
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    return zlib.crc32(key)
+
+class _HashRows:
+    '''
+    hash:row lookup of TransactionsColumns
+
+    open addressing table of rows, keys are compared with HashColumn,
+        so hashes are not stored twice and no int object is kept per row like in dict
+    '''
+    def __init__(self, hashes:HashColumn, table = None, size = 0):
+        '''table, size - of already filled table, its size has to be power of 2'''
+        if table == None:
+            table = array.array('i', [-1])*8
+        self.hashes = hashes # hashes of TransactionsColumns
+        self.table = table
+        self.size = size
+
+    def _find_slot(self, key) -> int:
+        '''key - HashColumn key'''
+        mask = len(self.table) - 1
+        slot = _hash_key(key) & mask
+        while True:
+            row = self.table[slot]
+            if row == -1 or self.hashes.get_key(row) == key:
+                return slot
+            slot = (slot + 1) & mask
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, transaction_hash:str) -> bool:
+        return self.table[self._find_slot(HashColumn.encode(transaction_hash))] != -1
+
+    def get(self, transaction_hash:str, default = None):
+        row = self.table[self._find_slot(HashColumn.encode(transaction_hash))]
+        if row == -1:
+            return default
+        return row
+
+    def __setitem__(self, transaction_hash:str, row:int):
+        self._set_row(HashColumn.encode(transaction_hash), row)
+
+    def add_row(self, row:int):
+        '''indexes row by its hash in column'''
+        self._set_row(self.hashes.get_key(row), row)
+
+    def _set_row(self, key, row:int):
+        slot = self._find_slot(key)
+        if self.table[slot] == -1:
+            self.size += 1
+        self.table[slot] = row
+        if self.size*2 > len(self.table):
+            self._resize(len(self.table)*2)
+
+    def _resize(self, table_size:int):
+        rows = [row for row in self.table if row != -1]
+        self.table = array.array('i', [-1])*table_size
+        for row in rows:
+            self.table[self._find_slot(self.hashes.get_key(row))] = row
+
+class AccountFeatures:
+    '''per-account counters used by one-way heuristics'''
+    __slots__ = ('senders', 'recipients', 'recieved_count', 'sent_count')
+
+    def __init__(self):
+        self.senders = {} # username:transactions_amount, in chain order
+        self.recipients = {} # username:transactions_amount, in chain order
+        self.recieved_count = 0
+        self.sent_count = 0
+
+    def in_degree(self) -> int:
+        return len(self.senders)
+
+    def out_degree(self) -> int:
+        return len(self.recipients)
+
+    def inflow_share(self, sender:str) -> float:
+        '''share of recieved transactions sent by sender, 1.0 if none recieved'''
+        if self.recieved_count == 0:
+            return 1.0
+        return self.senders.get(sender,0) / self.recieved_count
+
+    def outflow_share(self, recipient:str) -> float:
+        '''share of sent transactions recieved by recipient, 1.0 if none sent'''
+        if self.sent_count == 0:
+            return 1.0
+        return self.recipients.get(recipient,0) / self.sent_count
+
 class TrasnsactionsChain:
     '''Main class for working with connected transactions'''
-    def __init__(self, root_username, transactions=[], sort = True):
+    def __init__(self, root_username, transactions=None, sort = True, columnar = False,
+                 keep_graph = False):
+        '''
+        columnar - keep transactions in TransactionsColumns
+            and work with TransactionView rows
+        keep_graph - create self.graph now, it is updated on every new transaction
+            (also after the first create_graph call)
+        '''
+        if transactions == None:
+            transactions = []
+        if columnar and not isinstance(transactions, TransactionsColumns):
+            transactions = TransactionsColumns(transactions)
         self.transactions = transactions
         self.sort = sort
         self.root_username = root_username
@@ -48,56 +408,202 @@ class TrasnsactionsChain:
             self._sort_transactions()
 
         self.graph = None
-        
-    def _binary_search(self,transaction:Transaction, start:int, end:int) -> int:
-        if start >= end:
-            if end<len(self.transactions) and self.transactions[end] > transaction:
-                return end
-            else:
-                return end+1       
 
-        half_start = start + ((end-start)>>1)
-        if transaction < self.transactions[half_start]:
-            return self._binary_search(transaction, start, half_start-1)
-        elif transaction > self.transactions[half_start]:
-            return self._binary_search(transaction, half_start+1, end)
-        else:
-            return half_start
-            
+        # columnar indexes keep rows, views are created on access
+        self._columns = None
+        self._index_key = _get_datetime # entry of index:datetime
+        self._hash_index = {} # hash:transaction
+        if isinstance(self.transactions, TransactionsColumns):
+            self._columns = self.transactions
+            self._index_key = self._columns.datetimes.__getitem__
+            self._hash_index = _HashRows(self._columns.hashes) # hash:row
+        self._sender_index = {} # username:[transaction] or array of rows
+        self._recipient_index = {} # username:[transaction] or array of rows
+        for transaction in self.transactions:
+            self._index_transaction(transaction)
+
+        if keep_graph:
+            self.create_graph()
+
+    @classmethod
+    def from_indexes(cls, root_username, columns:TransactionsColumns,
+                     sender_index, recipient_index, hash_index:_HashRows,
+                     sort = True, graph = None):
+        '''
+        returns columnar chain over already indexed columns,
+            nothing is copied, sorted or indexed
+
+        sender_index, recipient_index - {username:rows} with rows in order of columns
+        hash_index - _HashRows of columns.hashes
+        '''
+        chain = cls.__new__(cls)
+        chain.transactions = columns
+        chain.sort = sort
+        chain.root_username = root_username
+        chain.graph = graph
+        chain._columns = columns
+        chain._index_key = columns.datetimes.__getitem__
+        chain._hash_index = hash_index
+        chain._sender_index = sender_index
+        chain._recipient_index = recipient_index
+        return chain
+        
     def _sort_transactions(self):
+        if isinstance(self.transactions, TransactionsColumns):
+            self.transactions.sort_by_datetime()
+            return
         def sorting_criteria(element:Transaction):
             return element.datetime
         self.transactions.sort(key=sorting_criteria)
         
+    def _add_graph_edge(self, transaction:Transaction):
+        self.graph.add_edge(self.graph.add_node(transaction.sender),
+                            self.graph.add_node(transaction.recipient))
+
+    def _create_entries(self, entries = ()):
+        '''returns per-user list of index'''
+        if self._columns != None:
+            return array.array('i', entries)
+        return list(entries)
+
+    def _get_entry(self, transaction:Transaction):
+        '''returns what indexes keep for transaction of self.transactions'''
+        if self._columns != None:
+            return transaction._row
+        return transaction
+
+    def _get_transactions(self, entries) -> list:
+        if self._columns != None:
+            return [TransactionView(self._columns,row) for row in entries]
+        return entries
+
+    def _index_transaction(self, transaction:Transaction):
+        '''keeps per-user lists in the same order as self.transactions'''
+        if self.graph != None:
+            self._add_graph_edge(transaction)
+        entry = self._get_entry(transaction)
+        self._hash_index[transaction.hash] = entry
+        sent = self._sender_index.get(transaction.sender)
+        if sent == None:
+            sent = self._create_entries()
+            self._sender_index[transaction.sender] = sent
+        recieved = self._recipient_index.get(transaction.recipient)
+        if recieved == None:
+            recieved = self._create_entries()
+            self._recipient_index[transaction.recipient] = recieved
+        if self.sort:
+            bisect.insort_right(sent, entry, key=self._index_key)
+            bisect.insort_right(recieved, entry, key=self._index_key)
+        else:
+            sent.append(entry)
+            recieved.append(entry)
+
     def _search_transaction_by_hash(self, hash:str) -> Transaction:
-        for transaction in self.transactions:
-            if transaction.hash == hash:
-                return transaction
-                
+        if self._columns == None:
+            return self._hash_index.get(hash)
+        row = self._hash_index.get(hash)
+        if row == None:
+            return None
+        return TransactionView(self._columns,row)
+
+    def _index_transactions(self, transactions:list):
+        '''transactions - sorted by datetime if self.sort'''
+        if not self.sort:
+            for transaction in transactions:
+                self._index_transaction(transaction)
+            return
+        sent = {} # username:[entry]
+        recieved = {} # username:[entry]
+        for transaction in transactions:
+            if self.graph != None:
+                self._add_graph_edge(transaction)
+            entry = self._get_entry(transaction)
+            self._hash_index[transaction.hash] = entry
+            sent.setdefault(transaction.sender, []).append(entry)
+            recieved.setdefault(transaction.recipient, []).append(entry)
+        for new_entries, index in ((sent, self._sender_index),
+                                   (recieved, self._recipient_index)):
+            for username, user_entries in new_entries.items():
+                indexed = index.get(username)
+                if indexed == None:
+                    index[username] = self._create_entries(user_entries)
+                elif len(user_entries) <= INSERT_BATCH_SIZE:
+                    for entry in user_entries:
+                        bisect.insort_right(indexed, entry, key=self._index_key)
+                else:
+                    index[username] = self._create_entries(heapq.merge(indexed, user_entries,
+                                                                       key=self._index_key))
+
     def append_transaction(self, transaction:Transaction, ensure_no_copy=True):
-        if len(self.transactions) == 0:
-            self.transactions.append(transaction)
+        if ensure_no_copy and transaction.hash in self._hash_index:
+            if instrumentation.STATS != None:
+                instrumentation.STATS.count('duplicates_skipped')
             return
+        if instrumentation.STATS != None:
+            with instrumentation.STATS.time('append_transaction'):
+                self._append_transaction(transaction)
+            instrumentation.STATS.count('transactions_added')
+        else:
+            self._append_transaction(transaction)
+
+    def _append_transaction(self, transaction:Transaction):
         if self.sort:
-            index = self._binary_search(transaction,0,len(self.transactions))
+            index = bisect.bisect_right(self.transactions, transaction)
+            self.transactions.insert(index,transaction)
+            self._index_transaction(self.transactions[index])
+        else:
+            self.transactions.append(transaction)
+            self._index_transaction(self.transactions[-1])
+
+    def extend_transactions(self, transactions, ensure_no_copy=True) -> list:
+        '''
+        appends many transactions at once,
+            batch is sorted once and merged into chain in linear time
+        returns added transactions, duplicates are not in it
+        '''
+        stats = instrumentation.STATS
+        if stats != None:
+            start = time.perf_counter()
+        new_transactions = []
+        new_hashes = set()
+        duplicates_amount = 0
+        for transaction in transactions:
             if ensure_no_copy:
-                first_half = self.transactions[:index]
-                for tr in first_half[::-1]:
-                    if tr.datetime != transaction.datetime:
-                        break
-                    if tr.hash == transaction.hash:
-                        return
+                if transaction.hash in self._hash_index or transaction.hash in new_hashes:
+                    duplicates_amount += 1
+                    continue
+                new_transactions.append(transaction)
+                new_hashes.add(transaction.hash)
+            else:
+                new_transactions.append(transaction)
+        if stats != None:
+            stats.count('duplicates_skipped', duplicates_amount)
+            stats.count('transactions_added', len(new_transactions))
+        if len(new_transactions) == 0:
+            return []
 
-                second_half = self.transactions[index:]
-                for tr in second_half:
-                    if tr.datetime != transaction.datetime:
-                        break
-                    if tr.hash == transaction.hash:
-                        return
-            self.transactions.insert(index,transaction)
+        if self.sort:
+            new_transactions.sort(key=_get_datetime)
+        if self.sort and len(new_transactions) <= INSERT_BATCH_SIZE:
+            inserted = []
+            for transaction in new_transactions:
+                index = bisect.bisect_right(self.transactions, transaction.datetime, key=_get_datetime)
+                self.transactions.insert(index, transaction)
+                inserted.append(self.transactions[index])
+            new_transactions = inserted
+        elif isinstance(self.transactions, TransactionsColumns):
+            if self.sort:
+                new_transactions = self.transactions.merge(new_transactions)
+            else:
+                new_transactions = self.transactions.extend(new_transactions)
+        elif self.sort:
+            self.transactions[:] = heapq.merge(self.transactions, new_transactions, key=_get_datetime)
         else:
-            if self[transaction.hash] == None:
-                self.transactions.append(transaction)
+            self.transactions.extend(new_transactions)
+        self._index_transactions(new_transactions)
+        if stats != None:
+            stats.add_time('extend_transactions', time.perf_counter() - start)
+        return new_transactions
     
     def __getitem__(self, key):
         if isinstance(key,int):
@@ -105,39 +611,68 @@ class TrasnsactionsChain:
         elif isinstance(key,str):
             return self._search_transaction_by_hash(key)
     def __str__(self):
-        to_return = ''
-        for transaction in self.transactions[:-1]:
-            to_return += str(transaction) + '\n'
-        try:
-            to_return += str(transactions[-1])
-        except:
-            pass
-        return to_return
+        return '\n'.join(str(transaction) for transaction in self.transactions)
     def __repr__(self):
-        for transaction in self.transactions:
-            print(transaction.__repr__)
+        return f"<TrasnsactionsChain {self.root_username} | {len(self.transactions)} transactions>"
 
-    def search_transactions_by_recipient(self, username:str) -> list:
-        to_return = []
-        for transaction in self.transactions:
-            if transaction.recipient == username:
-                to_return.append(transaction)
-        return to_return
+    def _slice_by_time(self, transactions, start, end, key = _get_datetime) -> list:
+        '''
+        returns transactions with start <= datetime <= end,
+            transactions are bisected if chain is sorted
+        key - returns datetime of element of transactions
+        '''
+        start = _to_timestamp(start)
+        end = _to_timestamp(end)
+        if not self.sort:
+            return [transaction for transaction in transactions
+                    if (start == None or key(transaction) >= start)
+                    and (end == None or key(transaction) <= end)]
+        first = 0
+        last = len(transactions)
+        if start != None:
+            first = bisect.bisect_left(transactions, start, key=key)
+        if end != None:
+            last = bisect.bisect_right(transactions, end, key=key)
+        return transactions[first:last]
 
-    def search_transactions_by_sender(self, username:str) -> list:
-        to_return = []
-        for transaction in self.transactions:
-            if transaction.sender == username:
-                to_return.append(transaction)
-        return to_return
+    def _search_index(self, index:dict, username:str, start, end) -> list:
+        entries = index.get(username)
+        if entries == None:
+            return []
+        return self._get_transactions(self._slice_by_time(entries, start, end, self._index_key))
 
-    def get_top_senders(self, recipient_username = None, top = 10):
+    def search_transactions_by_time(self, start = None, end = None) -> list:
+        '''
+        returns transactions with start <= datetime <= end
+
+        start, end - timestamp, datetime.datetime or "%d/%m/%Y %H:%M:%S",
+            None for no limit
+        '''
+        return self._slice_by_time(self.transactions, start, end)
+
+    def search_transactions_by_recipient(self, username:str, start = None, end = None) -> list:
+        return self._search_index(self._recipient_index, username, start, end)
+
+    def search_transactions_by_sender(self, username:str, start = None, end = None) -> list:
+        return self._search_index(self._sender_index, username, start, end)
+
+    def search_transactions_by_user(self, username:str, start = None, end = None) -> list:
+        '''returns transactions sent or recieved by username'''
+        # transactions to self are already in sent ones
+        recieved = [transaction
+                    for transaction in self.search_transactions_by_recipient(username, start, end)
+                    if transaction.sender != username]
+        return list(heapq.merge(self.search_transactions_by_sender(username, start, end),
+                                recieved,
+                                key=_get_datetime))
+
+    def get_top_senders(self, recipient_username = None, top = 10, start = None, end = None):
         '''returns list[sender_username, amount_sent]'''
         if recipient_username == None:
             recipient_username = self.root_username
         amounts = [] # [username,amount]
         lookup_table = {} # username:index
-        transactions = self.search_transactions_by_recipient(recipient_username)
+        transactions = self.search_transactions_by_recipient(recipient_username, start, end)
         for transaction in transactions:
             index = lookup_table.get(transaction.get_sender(),len(amounts))
             if index == len(amounts):
@@ -149,13 +684,13 @@ class TrasnsactionsChain:
         amounts.sort(reverse=True, key=sorting_criteria)
         return amounts[:top]
 
-    def get_top_recipients(self, sender_username = None, top = 10):
+    def get_top_recipients(self, sender_username = None, top = 10, start = None, end = None):
         '''returns list[recipient_username, amount_recieved_from_sender]'''
         if sender_username == None:
             sender_username = self.root_username
         amounts = [] # [username,amount]
         lookup_table = {} # username:index
-        transactions = self.search_transactions_by_sender(sender_username)
+        transactions = self.search_transactions_by_sender(sender_username, start, end)
         for transaction in transactions:
             index = lookup_table.get(transaction.get_recipient(),len(amounts))
             if index == len(amounts):
@@ -168,121 +703,115 @@ class TrasnsactionsChain:
         amounts.sort(reverse=True, key=sorting_criteria)
         return amounts[:top]
     
-    def search_one_way_senders(self, recipient=None) -> list:
+    def get_accounts_features(self) -> dict:
+        '''
+        returns {username:AccountFeatures} for all accounts,
+            computed in one pass over recipient and one over sender indexes
+        '''
+        if self._columns == None:
+            get_sender = operator.attrgetter('sender')
+            get_recipient = operator.attrgetter('recipient')
+        else:
+            accounts = self._columns.accounts
+            senders = self._columns.senders
+            recipients = self._columns.recipients
+            def get_sender(row:int) -> str:
+                return accounts[senders[row]]
+            def get_recipient(row:int) -> str:
+                return accounts[recipients[row]]
+        features = {}
+        for username, recieved_entries in self._recipient_index.items():
+            account = features.setdefault(username, AccountFeatures())
+            for entry in recieved_entries:
+                sender = get_sender(entry)
+                account.senders[sender] = account.senders.get(sender,0) + 1
+            account.recieved_count += len(recieved_entries)
+        for username, sent_entries in self._sender_index.items():
+            account = features.setdefault(username, AccountFeatures())
+            for entry in sent_entries:
+                recipient = get_recipient(entry)
+                account.recipients[recipient] = account.recipients.get(recipient,0) + 1
+            account.sent_count += len(sent_entries)
+        return features
+
+    def search_one_way_senders(self, recipient=None, features:dict=None) -> list:
+        '''features - result of get_accounts_features to reuse'''
         if recipient == None:
             recipient = self.root_username
-        recieved_transactions = self.search_transactions_by_recipient(recipient)
-        #sent_by_recipient_transactions = self.search_transactions_by_sender(recipient)
-        processed_senders = {} # username:True
+        if features == None:
+            features = self.get_accounts_features()
+        if recipient not in features:
+            return []
         to_return = []
 
-        for transaction in recieved_transactions:
-            if transaction.get_sender() in processed_senders:
-                continue
-            else:
-                processed_senders[transaction.get_sender()] = True
-
+        for sender in features[recipient].senders:
+            sender_features = features[sender]
             only_one_recipient = 1
             only_sending = 1
             same_recipient_sender = 1
 
-            recieved_by_sender_transactions = self.search_transactions_by_recipient(transaction.get_sender())
-            if len(recieved_by_sender_transactions) > 0:
+            if sender_features.in_degree() > 0:
                 only_sending = 0
 
-            count_fails = 1
-            count_passes = 1
-            for recieved_transaction in recieved_by_sender_transactions:
-                if recieved_transaction.get_sender() == recipient:
-                    count_fails += 1
-                else:
-                    count_passes += 1
             #same_recipient_sender = count_fails//count_passes
-            if count_fails >= count_passes:
+            if sender_features.inflow_share(recipient) >= 0.5:
                 same_recipient_sender = 1
 
-            count_fails = 1
-            count_passes = 1
-            sent_transactions = self.search_transactions_by_sender(transaction.get_sender())
-            for sent_transaction in sent_transactions:
-                if sent_transaction.get_recipient() != recipient:
-                    count_passes += 1
-                else:
-                    count_fails += 1
             #only_one_recipient = count_fails//count_passes
-            if count_fails >= count_passes:
+            if sender_features.outflow_share(recipient) >= 0.5:
                 only_one_recipient = 1
             
             if only_one_recipient + only_sending + same_recipient_sender >= 2:
-                to_return.append(transaction.get_sender())   
+                to_return.append(sender)   
                 
         return to_return
 
 
-    def search_one_way_recipients(self, sender = None) -> list:
+    def search_one_way_recipients(self, sender = None, features:dict=None) -> list:
+        '''features - result of get_accounts_features to reuse'''
         if sender == None:
             sender = self.root_username
-        sent_by_recipient_transactions = self.search_transactions_by_sender(sender)
-        processed_recipients = {} # username:True
+        if features == None:
+            features = self.get_accounts_features()
+        if sender not in features:
+            return []
         to_return = []
 
-        for transaction in sent_by_recipient_transactions:
-            if transaction.get_recipient() in processed_recipients:
-                continue
-            else:
-                processed_recipients[transaction.get_recipient()] = True
-
+        for recipient in features[sender].recipients:
+            recipient_features = features[recipient]
             only_one_recipient = 1
             only_recieving = 1
             same_recipient_sender = 1
 
-            sent_by_reciever_transactions = self.search_transactions_by_sender(transaction.get_recipient())
-            if len(sent_by_reciever_transactions) > 0:
+            if recipient_features.out_degree() > 0:
                 only_recieving = 0
-            
-            recieved_by_reciever_transactions = self.search_transactions_by_recipient(transaction.get_recipient())
 
-            count_fails = 1
-            count_passes = 1
-            for recieved_transaction in recieved_by_reciever_transactions:
-                if recieved_transaction.get_sender() == sender:
-                    count_fails += 1
-                else:
-                    count_passes += 1
             #same_recipient_sender = count_fails//count_passes
-            if count_fails >= count_passes:
+            if recipient_features.inflow_share(sender) >= 0.5:
                 same_recipient_sender = 1
 
-            count_fails = 1
-            count_passes = 1
-            sent_transactions = self.search_transactions_by_sender(transaction.get_sender())
-            for sent_transaction in sent_transactions:
-                if sent_transaction.get_recipient() != sender:
-                    count_passes += 1
-                else:
-                    count_fails += 1
             #only_one_recipient = count_fails//count_passes
-            if count_fails >= count_passes:
+            if features[sender].outflow_share(sender) >= 0.5:
                 only_one_recipient = 1
             
             if only_one_recipient + only_recieving + same_recipient_sender >= 2:
-                to_return.append(transaction.get_recipient())   
+                to_return.append(recipient)   
                 
         return to_return
 
-    def total_recieved(self, username=None) -> float:
+    def total_recieved(self, username=None, start = None, end = None) -> float:
         if username == None:
             username = self.root_username
-        transactions = self.search_transactions_by_recipient(username)
+        transactions = self.search_transactions_by_recipient(username, start, end)
         to_return = 0.0
         for transaction in transactions:
             to_return += transaction.amount
         return to_return
 
-    def total_sent(self, username=None) -> float:
+    def total_sent(self, username=None, start = None, end = None) -> float:
         if username == None:
             username = self.root_username
-        transactions = self.search_transactions_by_sender(username)
+        transactions = self.search_transactions_by_sender(username, start, end)
         to_return = 0.0
         for transaction in transactions:
             to_return += transaction.amount
@@ -294,179 +823,760 @@ class TrasnsactionsChain:
         return self.total_recieved(username) > self.total_sent(username)
 
     '''GRAPH FUNCTIONS'''
-    def get_nodes(self) -> list:
+    def get_nodes(self, start = None, end = None) -> list:
         unique_usernames = {}
-        for transaction in self.transactions:
+        for transaction in self.search_transactions_by_time(start, end):
             if transaction.get_sender() not in unique_usernames:
                 unique_usernames[transaction.get_sender()] = True
             if transaction.get_recipient() not in unique_usernames:
                 unique_usernames[transaction.get_recipient()] = True
         return list(unique_usernames.keys())
 
-    def create_graph(self):
+    def create_graph(self, start = None, end = None):
+        '''
+        graph of the whole chain is stored in self.graph
+            and updated on every new transaction afterwards,
+            graph of transactions with start <= datetime <= end is not stored
         '''
-        0 - no connection
-        1 - sender
-        2 - reciever
-        3 - all connections
+        graph = Graph.Graph([])
+        for transaction in self.search_transactions_by_time(start, end):
+            sender_index = graph.add_node(transaction.get_sender())
+            recipient_index = graph.add_node(transaction.get_recipient())
+            graph.add_edge(sender_index,recipient_index)
+        
+        if start == None and end == None:
+            self.graph = graph
+        return graph
+
+    def get_traced_chain(self, username:str, white_list=[], max_depth = None, max_degree = None):
         '''
-        nodes = self.get_nodes()
-        nodes_index_lookup_table = {}
-        nodes_amount = len(nodes)
-        connection_matrix = []
-        weights = []
-        for i in range(nodes_amount):
-            connection_matrix.append([0]*nodes_amount)
-            weights.append([0]*nodes_amount)
-            nodes_index_lookup_table[nodes[i]] = i
+        returns TrasnsactionsChain with transactions
+            trace_transactions(username, white_list, max_depth=max_depth, max_degree=max_degree)
+            would collect from this chain
 
+        crawl is replayed with the same CrawlFrontier,
+            so every username it fetches has to be fetched into this chain
+        '''
+        frontier = CrawlFrontier(white_list, max_depth, max_degree)
+        frontier.push(username)
+        hashes = set()
+        transactions = []
+        while len(frontier) > 0:
+            processed_username = frontier.pop()
+            user_transactions = self.search_transactions_by_user(processed_username)
+            for transaction in user_transactions:
+                if transaction.hash not in hashes:
+                    hashes.add(transaction.hash)
+                    transactions.append(transaction)
+            frontier.expand(processed_username, user_transactions)
+        return TrasnsactionsChain(username, transactions, self.sort)
+
+    def get_clusters(self, strongly_connected = False, min_size = 2) -> list:
+        '''
+        returns list[Graph.Cluster] of linked accounts sorted by size,
+            volume of cluster is amount sent between its members
+        '''
+        if self.graph == None:
+            self.create_graph()
+        clusters = self.graph.get_clusters(strongly_connected, min_size)
+        clusters_lookup_table = {} # username:cluster
+        for cluster in clusters:
+            cluster.volume = 0.0
+            for username in cluster.members:
+                clusters_lookup_table[username] = cluster
         for transaction in self.transactions:
-            sender_index = nodes_index_lookup_table[transaction.get_sender()]
-            recipient_index = nodes_index_lookup_table[transaction.get_recipient()]
-            if connection_matrix[sender_index][recipient_index] == 0:
-                connection_matrix[sender_index][recipient_index] = 1
-            elif connection_matrix[sender_index][recipient_index] == 2:
-                connection_matrix[sender_index][recipient_index] = 3
-
-            if connection_matrix[recipient_index][sender_index] == 0:
-                connection_matrix[recipient_index][sender_index] = 2
-            elif connection_matrix[recipient_index][sender_index] == 1:
-                connection_matrix[recipient_index][sender_index] = 3
-
-            weights[sender_index][recipient_index] += 1
-            weights[recipient_index][sender_index] += 1
-        
-        self.graph = Graph.Graph(connection_matrix,nodes,weights)
-        return self.graph
+            cluster = clusters_lookup_table.get(transaction.sender)
+            if cluster != None and clusters_lookup_table.get(transaction.recipient) is cluster:
+                cluster.volume += transaction.amount
+        return clusters
 
 
 
 
 
         
-def get_transactions(username:str) -> list:
-    '''gets transactions for 1 user'''
+class _JsonStream:
+    '''reads json values one by one from iterable of text chunks'''
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.position = 0
+        self.decoder = json.JSONDecoder()
+
+    def _read(self) -> bool:
+        '''returns False at the end of stream'''
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer = self.buffer[self.position:] + chunk
+                self.position = 0
+                return True
+        return False
+
+    def next_char(self) -> str:
+        '''skips whitespaces, returns '' at the end of stream'''
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in ' \t\r\n':
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                return ''
+
+    def expect(self, char:str):
+        if self.next_char() != char:
+            raise ValueError(f"expected {char!r} at {self.position} in json stream")
+        self.position += 1
 
+    def decode(self):
+        self.next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # value at the very end of buffer can be a cut number
+                if end < len(self.buffer) or not self._read():
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._read():
+                    raise
+
+def parse_transactions_stream(chunks):
+    '''
+    yields Transaction for every item of "result" array,
+        items are parsed as soon as their text is recieved
+
+    chunks - iterable of str
+    '''
+    stream = _JsonStream(chunks)
+    stream.expect('{')
+    if stream.next_char() == '}':
+        return
     while True:
+        key = stream.decode()
+        stream.expect(':')
+        if key == 'result' and stream.next_char() == '[':
+            stream.expect('[')
+            if stream.next_char() == ']':
+                stream.position += 1
+            else:
+                while True:
+                    transaction = stream.decode()
+                    yield Transaction(transaction['hash'],transaction)
+                    if stream.next_char() == ']':
+                        stream.position += 1
+                        break
+                    stream.expect(',')
+        else:
+            stream.decode()
+        if stream.next_char() != ',':
+            stream.expect('}')
+            return
+        stream.expect(',')
+
+def _decode_chunks(chunks):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+def _iter_response_text(response):
+    return _decode_chunks(response.iter_content(STREAM_CHUNK_SIZE))
+
+def iter_transactions(username:str,
+                      session=None,
+                      api_url=API_URL,
+                      cache=None,
+                      retry_policy=None,
+                      rate_limiter=None):
+    '''
+    yields transactions for 1 user while response is being downloaded
+
+    session - requests.Session to reuse pooled connections
+    cache - TransactionsCache, fresh cached users are not refetched
+    retry_policy - fetch_policy.RetryPolicy, RETRY_POLICY by default
+    rate_limiter - fetch_policy.RateLimiter, RATE_LIMITER by default
+
+    raises fetch_policy.FetchError when attempts are exhausted
+        or server refuses request
+    '''
+    stats = instrumentation.STATS
+    if cache != None:
+        rows = cache.get(username)
+        if rows != None:
+            if stats != None:
+                stats.count('cache_hits')
+                stats.count('transactions_fetched', len(rows))
+            for row in rows:
+                yield Transaction.from_row(row)
+            return
+        rows = []
+    if session == None:
+        session = requests
+    if retry_policy == None:
+        retry_policy = RETRY_POLICY
+    if rate_limiter == None:
+        rate_limiter = RATE_LIMITER
+
+    url = f"{api_url}{username}"
+    bucket = rate_limiter.get_bucket(url)
+    yielded = 0
+    attempts = 0
+    if stats != None:
+        fetch_start = time.perf_counter()
+    while True:
+        if stats != None:
+            with stats.time('rate_limit_wait'):
+                bucket.acquire()
+            request_start = time.perf_counter()
+        else:
+            bucket.acquire()
+        attempts += 1
+        retry_after = None
         try:
-            transactions_json = requests.get(
-                f"https://server.duinocoin.com/user_transactions/{username}").json()
-            break
+            with session.get(url, stream=True, timeout=retry_policy.timeout) as response:
+                if stats != None:
+                    stats.observe('fetch_latency', time.perf_counter() - request_start)
+                status_code = response.status_code
+                if status_code >= 400:
+                    if not retry_policy.is_retryable(status_code):
+                        raise fetch_policy.FetchError(url, attempts, f"HTTP {status_code}", status_code)
+                    retry_after = fetch_policy.parse_retry_after(response.headers.get('Retry-After'))
+                    bucket.slow_down(retry_after)
+                    if stats != None:
+                        stats.count('throttled')
+                    error = f"HTTP {status_code}"
+                else:
+                    if stats != None:
+                        # download is time waiting for chunks, parse is the rest
+                        chunks = instrumentation.TimedIterator(response.iter_content(STREAM_CHUNK_SIZE))
+                        transactions = instrumentation.TimedIterator(
+                            parse_transactions_stream(_decode_chunks(chunks)))
+                    else:
+                        transactions = parse_transactions_stream(_iter_response_text(response))
+                    for index, transaction in enumerate(transactions):
+                        # already yielded before retry
+                        if index < yielded:
+                            continue
+                        yielded += 1
+                        if cache != None:
+                            rows.append(transaction.to_row())
+                        yield transaction
+                    bucket.speed_up()
+                    if stats != None:
+                        stats.add_time('download', chunks.seconds)
+                        stats.add_time('parse', transactions.seconds - chunks.seconds)
+                    break
+        except fetch_policy.FetchError:
+            if stats != None:
+                stats.count('fetch_errors')
+            raise
         except Exception as e:
-            pass
-    to_return = []
-    for transaction in transactions_json['result']:
-        hash = transaction['hash']
-        to_return.append(Transaction(hash,transaction))
-    return to_return
+            error = repr(e)
+            status_code = None
+        if not retry_policy.can_retry(attempts):
+            if stats != None:
+                stats.count('fetch_errors')
+            raise fetch_policy.FetchError(url, attempts, error, status_code)
+        if stats != None:
+            stats.count('retries')
+            with stats.time('backoff'):
+                time.sleep(retry_policy.get_delay(attempts, retry_after))
+        else:
+            time.sleep(retry_policy.get_delay(attempts, retry_after))
+    if stats != None:
+        stats.add_time('fetch', time.perf_counter() - fetch_start)
+        stats.count('users_fetched')
+        stats.count('transactions_fetched', yielded)
+    if cache != None:
+        cache.store(username, rows)
+
+def get_transactions(username:str,
+                     session=None,
+                     api_url=API_URL,
+                     cache=None,
+                     retry_policy=None,
+                     rate_limiter=None) -> list:
+    '''
+    gets transactions for 1 user
+
+    session - requests.Session to reuse pooled connections
+    cache - TransactionsCache, fresh cached users are not refetched
+    retry_policy, rate_limiter - see iter_transactions
+    '''
+    return list(iter_transactions(username, session, api_url, cache, retry_policy, rate_limiter))
 
-def _get_transactions_threads_handler(username:str, buffer:list):    
-    results = get_transactions(username)
-    for result in results:
-        buffer.append(result)
+def _get_transactions_threads_handler(username:str, buffer:list, api_url=API_URL, cache=None, errors=None):    
+    try:
+        for result in iter_transactions(username, api_url=api_url, cache=cache):
+            buffer.append(result)
+    except Exception as e:
+        errors.append(e)
 
-def _get_transactions_threads_master(usernames:list) -> list:
-    buffer = []
+def _get_transactions_threads_master(usernames:list, api_url=API_URL, cache=None) -> list:
+    '''returns list[list[Transaction]] of every username in order of usernames'''
+    buffers = [[] for _ in usernames]
+    errors = []
     threads_pool = []
-    for username in usernames:
+    for username, buffer in zip(usernames, buffers):
         threads_pool.append(threading.Thread(target = _get_transactions_threads_handler,
                                         name = f'{username} getter',
-                                        args = (username,buffer)))
+                                        args = (username,buffer,api_url,cache,errors)))
     for thread in threads_pool:
         thread.start()
     for thread in threads_pool:
         thread.join()
-    return buffer
-    
+    if len(errors) > 0:
+        raise errors[0]
+    return buffers
+
+def _create_session(max_connections:int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class CrawlFrontier:
+    '''
+    Usernames waiting to be fetched while crawling
+
+    usernames are fetched in order they were found,
+        with prioritize usernames with the strongest rout to seeds go first,
+        strength of rout is amount of transactions of its weakest connection,
+        same as in Graph.find_strongest_correlations
+    '''
+    def __init__(self,
+                 white_list=[],
+                 max_depth = None,
+                 max_degree = None,
+                 prioritize = False):
+        '''
+        max_depth - usernames this amount of hops away from seeds are not expanded
+        max_degree - non-seed usernames with more counterparties are not expanded
+        '''
+        self.max_depth = max_depth
+        self.max_degree = max_degree
+        self.prioritize = prioritize
+        self.usernames_to_skip = {} # username:True
+        for username_to_skip in white_list:
+            self.usernames_to_skip[username_to_skip] = True
+        self.processed_usernames = {} # username:True
+        self.depths = {} # username:hops from seeds
+        self.weights = {} # username:strength of rout to seeds
+        self._queue = collections.deque()
+        self._heap = []
+        self._pushed_amount = 0
+        self._queued_amount = 0
+
+    def __len__(self):
+        return self._queued_amount
+
+    def push(self, username:str, depth = 0, weight = infinity) -> bool:
+        '''
+        queues username or updates its depth and weight
+
+        returns True if username was queued or updated
+        '''
+        if username in self.processed_usernames:
+            return False
+        known_depth = self.depths.get(username)
+        if known_depth == None:
+            self.depths[username] = depth
+            self.weights[username] = weight
+            self._queued_amount += 1
+        elif depth < known_depth or weight > self.weights[username]:
+            self.depths[username] = min(depth, known_depth)
+            if weight <= self.weights[username]:
+                return True
+            self.weights[username] = weight
+        else:
+            return False
+
+        if self.prioritize:
+            self._pushed_amount += 1
+            heapq.heappush(self._heap, (-weight, self._pushed_amount, username))
+        elif known_depth == None:
+            self._queue.append(username)
+        return True
+
+    def pop(self) -> str:
+        '''returns next username and marks it as processed'''
+        if self.prioritize:
+            while True:
+                weight, _, username = heapq.heappop(self._heap)
+                if username not in self.processed_usernames\
+                        and -weight == self.weights[username]:
+                    break
+        else:
+            username = self._queue.popleft()
+        self.processed_usernames[username] = True
+        self._queued_amount -= 1
+        return username
+
+    def pop_many(self, amount:int) -> list:
+        '''amount - -1 for all queued usernames'''
+        if amount == -1 or amount > self._queued_amount:
+            amount = self._queued_amount
+        return [self.pop() for _ in range(amount)]
+
+    def expand(self, username:str, transactions:list) -> list:
+        '''
+        queues counterparties of username found in its transactions
+
+        returns list[username, depth, weight] of queued or updated usernames
+        '''
+        depth = self.depths.get(username, 0)
+        if self.max_depth != None and depth >= self.max_depth:
+            return []
+        counterparties = {} # username:amount of transactions
+        for transaction in transactions:
+            if transaction.get_sender() == username:
+                counterparty = transaction.get_recipient()
+            elif transaction.get_recipient() == username:
+                counterparty = transaction.get_sender()
+            else:
+                continue
+            if counterparty != username and counterparty not in self.usernames_to_skip:
+                counterparties[counterparty] = counterparties.get(counterparty, 0) + 1
+        if depth > 0 and self.max_degree != None\
+                and len(counterparties) > self.max_degree:
+            return []
+
+        weight = self.weights.get(username, infinity)
+        to_return = []
+        for counterparty, amount in counterparties.items():
+            counterparty_weight = min(weight, amount)
+            if self.push(counterparty, depth+1, counterparty_weight):
+                to_return.append([counterparty,
+                                  self.depths[counterparty],
+                                  self.weights[counterparty]])
+        return to_return
+
+async def trace_transactions_async(username:str,
+                                   white_list=[],
+                                   max_concurrency = 10,
+                                   api_url = API_URL,
+                                   cache = None,
+                                   transactions_chain = None,
+                                   checkpoint_path = None,
+                                   resume = False,
+                                   checkpoint_interval = 10.0,
+                                   max_depth = None,
+                                   max_degree = None,
+                                   prioritize = False,
+                                   max_users = None) -> TrasnsactionsChain:
+    '''
+    traces all transactions for username and all related transactions
+
+    max_concurrency usernames are fetched at once,
+        next username is taken from the frontier as soon as any fetch is done
+    transactions_chain - chain to add transactions to while crawling,
+        e.g. created with keep_graph=True to query graph mid-crawl
+    checkpoint_path - file crawl state is appended to every checkpoint_interval seconds
+    resume - continue crawl from checkpoint_path
+    max_depth, max_degree, prioritize - see CrawlFrontier
+    max_users - stop after this amount of usernames is fetched
+    '''
+    if transactions_chain == None:
+        transactions_chain = TrasnsactionsChain(username)
+    frontier = CrawlFrontier(white_list, max_depth, max_degree, prioritize)
+    if checkpoint_path == None:
+        frontier.push(username)
+        return await _crawl_async(frontier,
+                                  max_concurrency,
+                                  api_url,
+                                  cache,
+                                  transactions_chain,
+                                  max_users=max_users)
+
+    checkpoint = _open_crawl_checkpoint(checkpoint_path, resume, checkpoint_interval,
+                                        [username], frontier, transactions_chain)
+    try:
+        return await _crawl_async(frontier,
+                                  max_concurrency,
+                                  api_url,
+                                  cache,
+                                  transactions_chain,
+                                  checkpoint,
+                                  max_users)
+    finally:
+        checkpoint.close()
+
+async def _crawl_async(frontier:CrawlFrontier,
+                       max_concurrency,
+                       api_url,
+                       cache,
+                       transactions_chain:TrasnsactionsChain,
+                       checkpoint = None,
+                       max_users = None) -> TrasnsactionsChain:
+    '''crawls all usernames of frontier'''
+    loop = asyncio.get_running_loop()
+    session = _create_session(max_concurrency)
+    executor = concurrent.futures.ThreadPoolExecutor(max_concurrency)
+
+    async def fetch(username:str) -> tuple:
+        transactions = await loop.run_in_executor(executor,
+                                                  get_transactions,
+                                                  username,
+                                                  session,
+                                                  api_url,
+                                                  cache)
+        return username, transactions
+
+    fetched_amount = 0
+    pending = set()
+    try:
+        while True:
+            while len(frontier) > 0 and len(pending) < max_concurrency\
+                    and (max_users == None or fetched_amount < max_users):
+                pending.add(asyncio.create_task(fetch(frontier.pop())))
+                fetched_amount += 1
+            if len(pending) == 0:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                username, transactions = task.result()
+                queued_usernames = frontier.expand(username, transactions)
+                added_transactions = transactions_chain.extend_transactions(transactions)
+                if checkpoint != None:
+                    checkpoint.add_processed([username],
+                                             [transaction.to_row() for transaction in added_transactions],
+                                             queued_usernames)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        executor.shutdown(wait=False)
+        session.close()
+    return transactions_chain
  
 def trace_transactions(username:str,
                        white_list=[],
                        use_threads = True, 
-                       max_bunch = 10) -> TrasnsactionsChain:
+                       max_bunch = 10,
+                       use_asyncio = False,
+                       max_concurrency = 10,
+                       api_url = API_URL,
+                       cache = None,
+                       transactions_chain = None,
+                       checkpoint_path = None,
+                       resume = False,
+                       checkpoint_interval = 10.0,
+                       max_depth = None,
+                       max_degree = None,
+                       prioritize = False,
+                       max_users = None,
+                       collect_stats = False,
+                       profile = False) -> TrasnsactionsChain:
     '''
     traces all transactions for username and all related transactions
+
+    use_asyncio - crawl with trace_transactions_async instead of threads
+    cache - TransactionsCache shared between runs
+    transactions_chain - chain to add transactions to while crawling
+    checkpoint_path - file crawl state is appended to every checkpoint_interval seconds
+    resume - continue crawl from checkpoint_path
+    max_depth, max_degree, prioritize - see CrawlFrontier
+    max_users - stop after this amount of usernames is fetched
+    collect_stats - returns tuple(chain, instrumentation.Stats.report())
+    profile - also sample stacks while crawling, needs collect_stats
     '''
-    usernames_to_skip = {}
-    for username_to_skip in white_list:
-        usernames_to_skip[username_to_skip] = True
+    if collect_stats:
+        with instrumentation.collect(profile) as stats:
+            with stats.time('crawl'):
+                transactions_chain = trace_transactions(username,
+                                                        white_list,
+                                                        use_threads,
+                                                        max_bunch,
+                                                        use_asyncio,
+                                                        max_concurrency,
+                                                        api_url,
+                                                        cache,
+                                                        transactions_chain,
+                                                        checkpoint_path,
+                                                        resume,
+                                                        checkpoint_interval,
+                                                        max_depth,
+                                                        max_degree,
+                                                        prioritize,
+                                                        max_users)
+        return transactions_chain, stats.report()
 
-    transactions_chain = TrasnsactionsChain(username)
-    processed_usernames = {} # username:True
-    usernames_to_process = [username]
-    
+    if use_asyncio:
+        return asyncio.run(trace_transactions_async(username,
+                                                    white_list,
+                                                    max_concurrency,
+                                                    api_url,
+                                                    cache,
+                                                    transactions_chain,
+                                                    checkpoint_path,
+                                                    resume,
+                                                    checkpoint_interval,
+                                                    max_depth,
+                                                    max_degree,
+                                                    prioritize,
+                                                    max_users))
+
+    if transactions_chain == None:
+        transactions_chain = TrasnsactionsChain(username)
+    frontier = CrawlFrontier(white_list, max_depth, max_degree, prioritize)
+    if checkpoint_path == None:
+        frontier.push(username)
+        return _trace_transactions(frontier, use_threads, max_bunch,
+                                   api_url, cache, transactions_chain,
+                                   max_users=max_users)
+
+    checkpoint = _open_crawl_checkpoint(checkpoint_path, resume, checkpoint_interval,
+                                        [username], frontier, transactions_chain)
+    try:
+        return _trace_transactions(frontier, use_threads, max_bunch,
+                                   api_url, cache, transactions_chain,
+                                   checkpoint, max_users)
+    finally:
+        checkpoint.close()
+
+def _open_crawl_checkpoint(checkpoint_path:str,
+                           resume:bool,
+                           interval:float,
+                           usernames:list,
+                           frontier:CrawlFrontier,
+                           transactions_chain:TrasnsactionsChain) -> crawl_checkpoint.CrawlCheckpoint:
+    '''
+    loads state into frontier and transactions_chain if resume,
+        otherwise queues usernames
+    '''
+    checkpoint = crawl_checkpoint.CrawlCheckpoint(checkpoint_path, interval)
+    resumed = False
+    if resume:
+        rows, queued_usernames, processed_usernames = checkpoint.load()
+        if len(queued_usernames) > 0:
+            resumed = True
+            transactions_chain.extend_transactions(Transaction.from_row(row) for row in rows)
+            for username in processed_usernames:
+                frontier.processed_usernames[username] = True
+            for username, depth, weight in queued_usernames:
+                frontier.push(username, depth, weight)
+    checkpoint.open(resumed)
+    if not resumed:
+        checkpoint.add_queued([[username, 0, infinity] for username in usernames
+                               if frontier.push(username)])
+    return checkpoint
+
+def _trace_transactions(frontier:CrawlFrontier,
+                        use_threads,
+                        max_bunch,
+                        api_url,
+                        cache,
+                        transactions_chain:TrasnsactionsChain,
+                        checkpoint = None,
+                        max_users = None) -> TrasnsactionsChain:
     if not use_threads:
-        while len(usernames_to_process) > 0:
-            username = usernames_to_process.pop(0)
-            transactions = get_transactions(username)
-            processed_usernames[username] = True
-            for transaction in transactions:
-                if transaction.get_sender() not in processed_usernames\
-                        and transaction.get_sender() not in usernames_to_process\
-                        and transaction.get_sender() not in usernames_to_skip:
-                    usernames_to_process.append(transaction.get_sender())
-                elif transaction.get_recipient() not in processed_usernames\
-                        and transaction.get_recipient() not in usernames_to_process\
-                        and transaction.get_recipient() not in usernames_to_skip:
-                    usernames_to_process.append(transaction.get_recipient())
-                
-                transactions_chain.append_transaction(transaction)
-    else:
-        while len(usernames_to_process) > 0:
-            if len(usernames_to_process) == 0:
-                username = usernames_to_process.pop(0)
-                transactions = get_transactions(username)
-                processed_usernames[username] = True
-            elif max_bunch == -1 or len(usernames_to_process) < max_bunch:
-                transactions = _get_transactions_threads_master(usernames_to_process)
-                for username in usernames_to_process:
-                    processed_usernames[username] = True
-                usernames_to_process = []
-            else:
-                usernames = usernames_to_process[:max_bunch]
-                usernames_to_process = usernames_to_process[max_bunch:]
-                transactions = _get_transactions_threads_master(usernames)
-                for username in usernames:
-                    processed_usernames[username] = True
+        max_bunch = 1
+    fetched_amount = 0
+    while len(frontier) > 0 and (max_users == None or fetched_amount < max_users):
+        bunch = max_bunch
+        if max_users != None and (bunch == -1 or bunch > max_users - fetched_amount):
+            bunch = max_users - fetched_amount
+        usernames = frontier.pop_many(bunch)
+        fetched_amount += len(usernames)
+        if not use_threads:
+            users_transactions = [list(iter_transactions(usernames[0], api_url=api_url, cache=cache))]
+        else:
+            users_transactions = _get_transactions_threads_master(usernames, api_url, cache)
 
-            
-            for transaction in transactions:
-                if transaction.get_sender() not in processed_usernames\
-                        and transaction.get_sender() not in usernames_to_process\
-                        and transaction.get_sender() not in usernames_to_skip:
-                    usernames_to_process.append(transaction.get_sender())
-                elif transaction.get_recipient() not in processed_usernames\
-                        and transaction.get_recipient() not in usernames_to_process\
-                        and transaction.get_recipient() not in usernames_to_skip:
-                    usernames_to_process.append(transaction.get_recipient())
-                
-                transactions_chain.append_transaction(transaction)
+        queued_usernames = []
+        transactions = []
+        for username, user_transactions in zip(usernames, users_transactions):
+            queued_usernames.extend(frontier.expand(username, user_transactions))
+            transactions.extend(user_transactions)
+        added_transactions = transactions_chain.extend_transactions(transactions)
+        if checkpoint != None:
+            checkpoint.add_processed(usernames,
+                                     [transaction.to_row() for transaction in added_transactions],
+                                     queued_usernames)
     return transactions_chain
 
-def total_recieved(username:str) -> float:
+def _detect_suspicious_accounts_worker(username:str, rows:list, white_list:list) -> tuple:
+    transactions = TrasnsactionsChain(username, [Transaction.from_row(row) for row in rows])
+    return detect_suspicious_accounts(username, white_list, transactions)
+
+def investigate(usernames:list,
+                white_list=[],
+                max_concurrency = 10,
+                processes = None,
+                api_url = API_URL,
+                cache = None,
+                max_depth = None,
+                max_degree = None) -> dict:
+    '''
+    traces all seed usernames with one shared frontier and fetched users,
+        then runs detect_suspicious_accounts for every seed in process pool
+
+    processes - size of process pool, None for cpu count
+    max_depth, max_degree - see CrawlFrontier, every seed is investigated
+        on transactions its own trace_transactions would collect
+
+    returns {username:(sus_accounts:list, main_accounts:list)}
+    '''
+    if len(usernames) == 0:
+        return {}
+    frontier = CrawlFrontier(white_list, max_depth, max_degree)
+    for username in usernames:
+        frontier.push(username)
+    transactions_chain = asyncio.run(_crawl_async(frontier,
+                                                  max_concurrency,
+                                                  api_url,
+                                                  cache,
+                                                  TrasnsactionsChain(usernames[0])))
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        futures = {}
+        for username in usernames:
+            traced_chain = transactions_chain.get_traced_chain(username, white_list, max_depth, max_degree)
+            futures[username] = executor.submit(_detect_suspicious_accounts_worker,
+                                                username,
+                                                [transaction.to_row() for transaction in traced_chain.transactions],
+                                                white_list)
+        return {username:future.result() for username, future in futures.items()}
+
+def total_recieved(username:str, cache=None) -> float:
     to_return = 0.0
-    transactions = get_transactions(username)
+    transactions = get_transactions(username, cache=cache)
     for transaction in transactions:
         if transaction.get_recipient() == username:
             to_return += transaction.amount
     return to_return
 
-def total_sent(username:str) -> float:
+def total_sent(username:str, cache=None) -> float:
     to_return = 0.0
-    transactions = get_transactions(username)
+    transactions = get_transactions(username, cache=cache)
     for transaction in transactions:
         if transaction.get_sender() == username:
             to_return += transaction.amount
     return to_return
 
 def determine_main_account(transactions:TrasnsactionsChain,
-                          suspicious_accounts:list):
-    '''returns list with deterined main accounts'''
+                          suspicious_accounts:list,
+                          ranking = 'count'):
+    '''
+    returns list with deterined main accounts
+
+    ranking - 'count' to compare amounts of recieved transactions,
+        'pagerank' or 'hits' sink score of centrality module, it needs numpy
+    '''
+    if ranking != 'count':
+        # centrality needs numpy and imports this module
+        try:
+            import centrality
+        except ImportError as error:
+            raise ImportError(f"ranking '{ranking}' needs numpy, install it or use ranking='count'") from error
+        return centrality.get_main_accounts(transactions, suspicious_accounts, ranking)
+
     to_return = [] 
     max_amount_transactions = 0
     max_amount_duco = 0
+    suspicious_amount = transactions.total_recieved()
     for sus in suspicious_accounts:
         suspicious_transactions = transactions.search_transactions_by_recipient(sus)
-        suspicious_amount = transactions.total_recieved()
 
         if len(to_return) > 0:
             if (len(suspicious_transactions) > max_amount_transactions\
@@ -489,53 +1599,62 @@ def determine_main_account(transactions:TrasnsactionsChain,
 def detect_suspicious_accounts(username:str,
                                white_list=[],
                                transactions:list=None,
+                               ranking = 'count',
                                **kwargs) -> tuple:
-    '''returns tuple(sus_accounts:list, main_accounts:list)'''
+    '''
+    returns tuple(sus_accounts:list, main_accounts:list)
+
+    ranking - see determine_main_account
+    '''
 
     if transactions == None:
-        transactions = trace_transactions(username,white_list,kwargs)
+        transactions = trace_transactions(username,white_list,**kwargs)
 
-    processed_usernames = {}
-    sus_usernames = {username:True}
+    with instrumentation.time_stage('account_features'):
+        features = transactions.get_accounts_features()
+    with instrumentation.time_stage('one_way_scan'):
+        processed_usernames = {}
+        sus_usernames = {username:True}
 
-    sus_accounts = transactions.search_one_way_senders()
-    for sus in sus_accounts:
-        if sus not in sus_usernames\
-            and sus not in white_list:
-            sus_usernames[sus] = True
+        sus_accounts = transactions.search_one_way_senders(features=features)
+        for sus in sus_accounts:
+            if sus not in sus_usernames\
+                and sus not in white_list:
+                sus_usernames[sus] = True
 
-    sus_accounts = transactions.search_one_way_recipients()
-    for sus in sus_accounts:
-        if sus not in sus_usernames\
-            and sus not in white_list:
-            sus_usernames[sus] = True
+        sus_accounts = transactions.search_one_way_recipients(features=features)
+        for sus in sus_accounts:
+            if sus not in sus_usernames\
+                and sus not in white_list:
+                sus_usernames[sus] = True
 
-    processed_usernames[username] = True
+        processed_usernames[username] = True
 
-    for transaction in transactions:
-        if transaction.get_sender() not in processed_usernames:
-            sus_accounts = transactions.search_one_way_senders(transaction.get_sender())
-            for sus in sus_accounts:
-                if sus not in sus_usernames\
-                    and sus not in white_list:
-                    sus_usernames[sus] = True
-
-            sus_accounts = transactions.search_one_way_recipients(transaction.get_sender())
-            for sus in sus_accounts:
-                if sus not in sus_usernames\
-                    and sus not in white_list:
-                    sus_usernames[sus] = True
-
-            processed_usernames[transaction.get_sender()] = True
-        if transaction.get_recipient() not in processed_usernames:
-            sus_accounts = transactions.search_one_way_senders(transaction.get_recipient())
-            for sus in sus_accounts:
-                if sus not in sus_usernames\
-                    and sus not in white_list:
-                    sus_usernames[sus] = True
-            processed_usernames[transaction.get_recipient()] = True
-    sus_usernames = list(sus_usernames.keys())
-    main_account = determine_main_account(transactions,sus_usernames)
+        for transaction in transactions:
+            if transaction.get_sender() not in processed_usernames:
+                sus_accounts = transactions.search_one_way_senders(transaction.get_sender(), features)
+                for sus in sus_accounts:
+                    if sus not in sus_usernames\
+                        and sus not in white_list:
+                        sus_usernames[sus] = True
+
+                sus_accounts = transactions.search_one_way_recipients(transaction.get_sender(), features)
+                for sus in sus_accounts:
+                    if sus not in sus_usernames\
+                        and sus not in white_list:
+                        sus_usernames[sus] = True
+
+                processed_usernames[transaction.get_sender()] = True
+            if transaction.get_recipient() not in processed_usernames:
+                sus_accounts = transactions.search_one_way_senders(transaction.get_recipient(), features)
+                for sus in sus_accounts:
+                    if sus not in sus_usernames\
+                        and sus not in white_list:
+                        sus_usernames[sus] = True
+                processed_usernames[transaction.get_recipient()] = True
+        sus_usernames = list(sus_usernames.keys())
+    with instrumentation.time_stage('determine_main_account'):
+        main_account = determine_main_account(transactions,sus_usernames,ranking)
     return sus_usernames, main_account
 
 
@@ -548,6 +1667,8 @@ if __name__ == '__main__':
     file = open('output.txt','w',encoding='utf-8')
     file.write(str(transactions))
     file.close()
+    import snapshot
+    snapshot.save_snapshot(transactions, 'output.snapshot', transactions.create_graph())
     print('Senders:')
     print(transactions.get_top_senders(username))
     print()